@@ -0,0 +1,127 @@
+import numpy as np
+
+# --- STREAM CONFIG ---
+SAMPLE_RATE = 16000                 # client_recorder.py sends 16 kHz mono float32
+FRAME_MS = 30                       # VAD decision granularity
+PRE_ROLL_MS = 300                   # audio kept from before speech onset
+END_SILENCE_MS = 600                # this much silence closes an utterance
+PARTIAL_INTERVAL_MS = 1500          # emit a partial this often while speaking
+MAX_UTTERANCE_SECONDS = 30          # force a final after this long
+MIN_SPEECH_RMS = 0.01               # absolute floor for the speech threshold
+NOISE_MULTIPLIER = 3.0              # speech = RMS above noise floor x this
+
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+
+class RingBuffer:
+    """Fixed-size float32 buffer; when full, the oldest samples are overwritten."""
+
+    def __init__(self, capacity: int):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._capacity = capacity
+        self._end = 0       # total samples ever written
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def write(self, samples: np.ndarray):
+        samples = samples[-self._capacity:]
+        n = len(samples)
+        start = self._end % self._capacity
+        first = min(n, self._capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:n - first] = samples[first:]
+        self._end += n
+        self._size = min(self._capacity, self._size + n)
+
+    def read(self) -> np.ndarray:
+        """Returns the buffered samples, oldest first (a copy)."""
+        start = (self._end - self._size) % self._capacity
+        if start + self._size <= self._capacity:
+            return self._data[start:start + self._size].copy()
+        return np.concatenate((self._data[start:], self._data[:(start + self._size) % self._capacity]))
+
+    def clear(self):
+        self._end = 0
+        self._size = 0
+
+
+class SpeechSegmenter:
+    """
+    Energy-based VAD over a live PCM stream.
+
+    feed() takes raw samples and returns a list of ("partial", audio) and
+    ("final", audio) events: partials while the user is still speaking,
+    a final once they pause for END_SILENCE_MS.
+    """
+
+    def __init__(self):
+        self._utterance = RingBuffer(SAMPLE_RATE * MAX_UTTERANCE_SECONDS)
+        self._pre_roll = RingBuffer(SAMPLE_RATE * PRE_ROLL_MS // 1000)
+        self._pending = np.zeros(0, dtype=np.float32)   # tail shorter than one frame
+        self._noise_floor = MIN_SPEECH_RMS / NOISE_MULTIPLIER
+        self._in_speech = False
+        self._silence_ms = 0
+        self._since_partial_ms = 0
+        self._speech_ms = 0
+
+    @property
+    def threshold(self):
+        return max(MIN_SPEECH_RMS, self._noise_floor * NOISE_MULTIPLIER)
+
+    def feed(self, samples: np.ndarray):
+        events = []
+        samples = np.concatenate((self._pending, samples.astype(np.float32, copy=False)))
+        n_frames = len(samples) // FRAME_SAMPLES
+        self._pending = samples[n_frames * FRAME_SAMPLES:]
+        if n_frames == 0:
+            return events
+
+        frames = samples[:n_frames * FRAME_SAMPLES].reshape(n_frames, FRAME_SAMPLES)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+
+        for frame, level in zip(frames, rms):
+            is_speech = level > self.threshold
+
+            if not self._in_speech:
+                if is_speech:
+                    self._start_utterance()
+                    self._utterance.write(frame)
+                else:
+                    # Track background noise only while nobody is talking
+                    self._noise_floor = 0.95 * self._noise_floor + 0.05 * level
+                    self._pre_roll.write(frame)
+                continue
+
+            self._utterance.write(frame)
+            self._speech_ms += FRAME_MS
+            self._since_partial_ms += FRAME_MS
+            self._silence_ms = 0 if is_speech else self._silence_ms + FRAME_MS
+
+            if self._silence_ms >= END_SILENCE_MS or self._speech_ms >= MAX_UTTERANCE_SECONDS * 1000:
+                events.append(("final", self._finish_utterance()))
+            elif self._since_partial_ms >= PARTIAL_INTERVAL_MS:
+                self._since_partial_ms = 0
+                events.append(("partial", self._utterance.read()))
+
+        return events
+
+    def flush(self):
+        """Closes the current utterance (e.g. the client stopped streaming)."""
+        if not self._in_speech:
+            return None
+        return self._finish_utterance()
+
+    def _start_utterance(self):
+        self._in_speech = True
+        self._silence_ms = self._since_partial_ms = self._speech_ms = 0
+        self._utterance.clear()
+        self._utterance.write(self._pre_roll.read())
+        self._pre_roll.clear()
+
+    def _finish_utterance(self):
+        audio = self._utterance.read()
+        self._utterance.clear()
+        self._in_speech = False
+        return audio
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import threading
+import httpx
+
+# --- CONFIG ---
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+MODEL_NAME = "phi3"
+# Small CPU sentence-embedding model for semantic search (`ollama pull all-minilm`)
+EMBED_MODEL = os.getenv("MINDMATE_EMBED_MODEL", "all-minilm")
+
+# Generation can take a while on CPU, but connecting to a local Ollama should not.
+TIMEOUT = httpx.Timeout(connect=5.0, read=120.0, write=10.0, pool=10.0)
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+
+
+class OllamaClient:
+    """
+    Client for Ollama's /api/generate and /api/embed, sharing one keep-alive
+    connection pool per caller kind: an AsyncClient for request handlers and
+    a blocking one for worker threads (the vector indexer).
+    """
+
+    def __init__(self, base_url=OLLAMA_BASE_URL, timeout=TIMEOUT, limits=LIMITS):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.limits = limits
+        self._client = None
+        self._loop = None
+        self._sync_client = None
+        self._sync_lock = threading.Lock()
+
+    async def _get_client(self):
+        # An AsyncClient is bound to the loop it was created on. Scripts that call
+        # asyncio.run() repeatedly get a fresh client instead of a dead one.
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is not loop:
+            stale, self._client = self._client, None
+            try:
+                await stale.aclose()
+            except Exception:
+                pass  # Its loop is already closed; the sockets went with it
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+            self._loop = loop
+        return self._client
+
+    async def generate(self, prompt, model=MODEL_NAME, timeout=None, **options):
+        """Returns the full completion text."""
+        payload = {"model": model, "prompt": prompt, "stream": False, **options}
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        client = await self._get_client()
+        response = await client.post("/api/generate", json=payload, **kwargs)
+        response.raise_for_status()
+        return response.json().get("response", "")
+
+    async def stream(self, prompt, model=MODEL_NAME, **options):
+        """Yields tokens as Ollama emits them (one JSON object per line)."""
+        payload = {"model": model, "prompt": prompt, "stream": True, **options}
+        client = await self._get_client()
+        async with client.stream("POST", "/api/generate", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
+
+    async def embed(self, texts, model=EMBED_MODEL, timeout=None):
+        """One embedding (list of floats) per text."""
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        client = await self._get_client()
+        response = await client.post("/api/embed", json={"model": model, "input": texts}, **kwargs)
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def embed_blocking(self, texts, model=EMBED_MODEL, timeout=None):
+        """embed() for threads without an event loop."""
+        with self._sync_lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+            client = self._sync_client
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        response = client.post("/api/embed", json={"model": model, "input": texts}, **kwargs)
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    async def aclose(self):
+        with self._sync_lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+
+ollama = OllamaClient()
@@ -1,102 +1,262 @@
-import json, requests, sqlite3, re, os
+import json, asyncio, re, os
+from contextlib import aclosing
 import numpy as np
 import joblib
 import pandas as pd
 from datetime import datetime, timedelta
-from services.db import get_db
+from services.db import db_reader, to_db_timestamp
+from services.context_cache import context_cache
+from services.vectors import vector_index
+from app.llm import ollama
+from models.lookup import HabitLookupTable
+from services.registry import registry
 
 # --- CONFIG ---
-OLLAMA_URL = "http://localhost:11434/api/generate"
-MODEL_NAME = "phi3"
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "../models/habit_model.pkl")
+KNOWLEDGE_TOP_K = 10
+# Serve habit predictions from a precompiled table instead of running the forest
+HABIT_LOOKUP = os.getenv("MINDMATE_HABIT_LOOKUP", "1") == "1"
 
 # --- HABIT MODEL ENGINE ---
+HABIT_FEATURES = ['Hour', 'DayOfWeek', 'Month', 'Location', 'Fatigue', 'PrevActivity']
+DEFAULT_LOCATION, DEFAULT_FATIGUE = 0, 1
+REST_ID = 4
+
 class HabitEngine:
-    def __init__(self):
+    def __init__(self, compiled=HABIT_LOOKUP):
         self.activity_map = {0: 'Sleep', 1: 'Breakfast', 2: 'Study', 3: 'Work', 4: 'Rest', 5: 'Gym'}
-        try:
-            self.model = joblib.load(MODEL_PATH)
-        except:
-            self.model = None
+        self._model = None
+        self._load_attempted = False
+        self.lookup = None
+        # Nothing is loaded here: the model/table is built on first use
+        if compiled:
+            # Grid: 24 hours x 7 days x 12 months x previous activity (fixed location/fatigue)
+            self.lookup = HabitLookupTable(MODEL_PATH, (24, 7, 12, len(self.activity_map)), self._grid_features)
 
-    def get_prediction(self, hour, day, month, prev_id=0):
-        if not self.model: return "Rest"
+    @property
+    def model(self):
+        if self.lookup: return self.lookup.model
+        if not self._load_attempted:
+            self._load_attempted = True
+            try:
+                self._model = joblib.load(MODEL_PATH)
+            except:
+                self._model = None
+        return self._model
+
+    @property
+    def is_loaded(self):
+        if self.lookup: return self.lookup.loaded
+        return self._model is not None
+
+    def warm_up(self):
+        if self.model is None:
+            raise FileNotFoundError(f"Habit model not found at {MODEL_PATH}")
+        return self
+
+    @staticmethod
+    def _grid_features(grid):
+        hour, day, month_idx, prev = grid.T
+        X = np.column_stack([hour, day, month_idx + 1, np.full_like(hour, DEFAULT_LOCATION),
+                             np.full_like(hour, DEFAULT_FATIGUE), prev])
+        return pd.DataFrame(X, columns=HABIT_FEATURES)
+
+    def _table_index(self, hour, day, month, prev_id):
+        index = (hour, day, month - 1, prev_id)
+        if self.lookup and self.lookup.ready and self.lookup.covers(index):
+            return index
+        return None
+
+    def predict_batch(self, X):
+        """Predicts activity ids for an (n, 6) feature matrix in one model call."""
+        X = np.asarray(X)
+        if not self.model or len(X) == 0: return np.full(len(X), REST_ID, dtype=int)
         # Using DataFrame to avoid Feature Name warnings
-        features = pd.DataFrame([[hour, day, month, 0, 1, prev_id]], 
-                                columns=['Hour', 'DayOfWeek', 'Month', 'Location', 'Fatigue', 'PrevActivity'])
-        pred_id = int(self.model.predict(features)[0])
+        return self.model.predict(pd.DataFrame(X, columns=HABIT_FEATURES)).astype(int)
+
+    def get_prediction(self, hour, day, month, prev_id=0):
+        index = self._table_index(hour, day, month, prev_id)
+        if index is not None:
+            pred_id = self.lookup.predict(index)
+        else:
+            if not self.model: return "Rest"
+            pred_id = int(self.predict_batch([[hour, day, month, DEFAULT_LOCATION, DEFAULT_FATIGUE, prev_id]])[0])
         return self.activity_map.get(pred_id, "Rest")
 
+    def transition_tables(self, days):
+        """
+        Next-activity table for every (hour, previous activity) pair of each
+        (day_of_week, month) in `days`, sliced from the compiled lookup table
+        when available, otherwise from a single predict call.
+        Returns an array shaped (len(days), 24, n_activities).
+        """
+        if self.lookup and self.lookup.ready and all(0 <= d < 7 and 1 <= m <= 12 for d, m in days):
+            table = self.lookup.predictions
+            return np.stack([table[:, d, m - 1, :] for d, m in days]).astype(int)
+
+        n_prev = len(self.activity_map)
+        hours, prevs = np.meshgrid(np.arange(24), np.arange(n_prev), indexing="ij")
+        hours, prevs = hours.ravel(), prevs.ravel()
+        blocks = [np.column_stack([hours, np.full_like(hours, d), np.full_like(hours, m),
+                                   np.full_like(hours, DEFAULT_LOCATION), np.full_like(hours, DEFAULT_FATIGUE), prevs])
+                  for d, m in days]
+        preds = self.predict_batch(np.vstack(blocks))
+        return preds.reshape(len(days), 24, n_prev)
+
+    def predict_days(self, dates, start_id=0):
+        """
+        Hour-by-hour schedules for many dates. The chain "this hour depends on
+        the last hour" is walked over precomputed tables instead of calling the
+        model 24 times per day.
+        """
+        keys = sorted({(d.weekday(), d.month) for d in dates})
+        tables = dict(zip(keys, self.transition_tables(keys)))
+        schedules = {}
+        for d in dates:
+            table, current = tables[(d.weekday(), d.month)], start_id
+            day = []
+            for hour in range(24):
+                current = int(table[hour, current]) if current < table.shape[1] else REST_ID
+                day.append((f"{hour:02d}:00", self.activity_map.get(current, "Rest")))
+            schedules[d.strftime("%Y-%m-%d")] = day
+        return schedules
+
 habit_engine = HabitEngine()
+registry.register("habit", habit_engine.warm_up, probe=lambda: habit_engine.is_loaded)
 
 # --- CONTEXT PROVIDERS ---
-def get_db_safe(): return get_db()
-
 def get_user_background_summary(user_id: str):
-    conn = get_db_safe()
-    cur = conn.cursor()
     profile = []
     try:
-        cur.execute("SELECT title FROM events WHERE user_id = ? ORDER BY id DESC LIMIT 5", (user_id,))
-        recent = [row[0].lower() for row in cur.fetchall()]
+        with db_reader() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT title FROM events WHERE user_id = ? ORDER BY id DESC LIMIT 5", (user_id,))
+            recent = [row[0].lower() for row in cur.fetchall()]
         if any(k in e for e in recent for k in ["exam", "lab", "study"]): profile.append("User Persona: Student")
         if any(k in e for e in recent for k in ["patient", "clinic"]): profile.append("User Persona: Medical Prof")
     except: pass
-    finally: conn.close()
     return "\n".join(profile)
 
-def get_relevant_knowledge(user_id: str, text: str):
-    conn = get_db_safe()
-    cur = conn.cursor()
+def _fts_query(user_id: str, text: str):
+    # Quote every token so user text can never inject FTS5 query syntax
+    keywords = sorted({w for w in re.findall(r'\w+', text.lower()) if len(w) >= 2})
+    if not keywords:
+        return ""
+    query = " OR ".join(f'"{w}"' for w in keywords)
+    # Restrict the MATCH to the user's records so FTS5 never scores anyone
+    # else's. The phrase is token-based ("Alice" matches "alice"), so callers
+    # still check user_id = ? exactly.
+    if re.search(r'\w', user_id):
+        return 'user_id : "%s" AND (%s)' % (user_id.replace('"', '""'), query)
+    return query
+
+def _format_hit(kind, title, summary, content, detail):
+    if kind == "event": return f"Event: {title} at {detail}"
+    if kind == "memory": return f"Memory: {title} - {summary}"
+    return f"Note: {title} - {summary}"
+
+RRF_K = 60   # reciprocal-rank fusion constant (keyword + semantic rankings)
+
+def get_relevant_knowledge(user_id: str, text: str, limit: int = KNOWLEDGE_TOP_K, query_vector=None):
+    # Two rankings of knowledge_fts rowids, fused by reciprocal rank:
+    # keywords (FTS5 / bm25) catch exact names, embeddings catch paraphrases
+    # ("physician" vs "doctor"). Without a query_vector (from
+    # vector_index.embed_query) only the keyword ranking is used.
+    rankings = [vector_index.search(user_id, query_vector, limit)]
+    query = _fts_query(user_id, text)
     found = []
-    keywords = [w for w in re.findall(r'\w+', text.lower()) if len(w) >= 2]
     try:
-        for word in keywords:
-            p = f'%{word}%'
-            cur.execute("SELECT title, summary FROM notes WHERE user_id=? AND (title LIKE ? OR summary LIKE ?)", (user_id, p, p))
-            for row in cur.fetchall(): found.append(f"Note: {row[0]} - {row[1]}")
-            cur.execute("SELECT title, start_time FROM events WHERE user_id=? AND (title LIKE ? OR start_time LIKE ?)", (user_id, p, p))
-            for row in cur.fetchall(): found.append(f"Event: {row[0]} at {row[1]}")
+        with db_reader() as conn:
+            cur = conn.cursor()
+            if query:
+                # One ranked MATCH over notes, events and memories (see init_db.init_search_index).
+                # bm25 weights: title > summary > content = detail; kind and user_id get 0.
+                cur.execute("""
+                    SELECT rowid FROM knowledge_fts
+                    WHERE knowledge_fts MATCH ? AND user_id = ?
+                    ORDER BY bm25(knowledge_fts, 0, 0, 10.0, 5.0, 1.0, 1.0) LIMIT ?
+                """, (query, user_id, limit))
+                rankings.append([row[0] for row in cur.fetchall()])
+
+            fused = {}
+            for ranking in rankings:
+                for rank, rowid in enumerate(ranking):
+                    fused[rowid] = fused.get(rowid, 0.0) + 1.0 / (RRF_K + rank)
+            best = sorted(fused, key=fused.get, reverse=True)[:limit]
+            if best:
+                cur.execute(f"""
+                    SELECT rowid, kind, title, summary, content, detail FROM knowledge_fts
+                    WHERE rowid IN ({",".join("?" * len(best))}) AND user_id = ?
+                """, (*best, user_id))
+                rows = {row[0]: row[1:] for row in cur.fetchall()}
+                found = [_format_hit(*rows[rowid]) for rowid in best if rowid in rows]
     except: pass
-    finally: conn.close()
-    return "\n".join(list(set(found))) if found else "No matching records."
+    return "\n".join(dict.fromkeys(found)) if found else "No matching records."
 
 def get_schedule_context(user_id: str):
-    conn = get_db_safe()
-    cur = conn.cursor()
     now = datetime.now()
     future = now + timedelta(hours=24)
     try:
-        cur.execute("SELECT title, start_time FROM events WHERE user_id=? AND start_time BETWEEN ? AND ?", 
-                    (user_id, now.strftime("%Y-%m-%d %H:%M"), future.strftime("%Y-%m-%d %H:%M")))
-        return "\n".join([f"- {r[0]} at {r[1]}" for r in cur.fetchall()])
+        with db_reader() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT title, start_time FROM events WHERE user_id=? AND start_time >= ? AND start_time < ? ORDER BY start_time",
+                        (user_id, to_db_timestamp(now), to_db_timestamp(future)))
+            return "\n".join([f"- {r[0]} at {r[1]}" for r in cur.fetchall()])
     except: return "No upcoming events."
-    finally: conn.close()
 
 # --- MAIN ASSISTANT LOGIC ---
-def generate_conversational_response(user_id, text):
-    knowledge = get_relevant_knowledge(user_id, text)
-    schedule = get_schedule_context(user_id)
-    background = get_user_background_summary(user_id)
-    
-    now = datetime.now()
-    habit_now = habit_engine.get_prediction(now.hour, now.weekday(), now.month)
+def get_user_context(user_id):
+    """The query-independent part of the prompt, cached per user (see services/context_cache)."""
+    def build():
+        now = datetime.now()
+        return {
+            "background": get_user_background_summary(user_id),
+            "schedule": get_schedule_context(user_id),
+            "habit_now": habit_engine.get_prediction(now.hour, now.weekday(), now.month),
+        }
+    # Keyed by the hour: the habit insight changes on the hour
+    return context_cache.get(user_id, build, key=datetime.now().strftime("%Y-%m-%d %H"))
+
+def build_conversation_prompt(user_id, text, query_vector=None):
+    knowledge = get_relevant_knowledge(user_id, text, query_vector=query_vector)
+    context = get_user_context(user_id)
+    background, schedule, habit_now = context["background"], context["schedule"], context["habit_now"]
 
-    prompt = f"""<|system|>
+    return f"""<|system|>
 You are MindMate, a Personal AI Assistant. 
 Background: {background} | Records: {knowledge} | Schedule: {schedule}
 Habit Insight: At this time, the user usually does: {habit_now}.
 INSTRUCTIONS: Use records for the past, habits for the routine, and be professional.<|end|>
 <|user|>{text}<|end|><|assistant|>"""
 
+async def conversation_prompt(user_id, text):
+    # The query embedding is an HTTP call, made on the event loop; context
+    # assembly hits SQLite and the habit model, so it runs in a thread.
+    query_vector = await vector_index.embed_query(text)
+    return await asyncio.to_thread(build_conversation_prompt, user_id, text, query_vector)
+
+async def generate_conversational_response(user_id, text):
+    prompt = await conversation_prompt(user_id, text)
+    try:
+        return await ollama.generate(prompt) or "I am listening..."
+    except Exception: return "Brain offline. Check Ollama."
+
+async def stream_conversational_response(user_id, text):
+    """Same as generate_conversational_response, but yields tokens as they arrive."""
+    prompt = await conversation_prompt(user_id, text)
     try:
-        response = requests.post(OLLAMA_URL, json={"model": MODEL_NAME, "prompt": prompt, "stream": False})
-        return response.json().get("response", "I am listening...")
-    except: return "Brain offline. Check Ollama."
+        # aclosing: a client disconnect (GeneratorExit) closes the Ollama stream right away
+        async with aclosing(ollama.stream(prompt)) as tokens:
+            async for token in tokens:
+                yield token
+        return
+    except Exception:
+        pass
+    yield "Brain offline. Check Ollama."
 
-def analyze_conversation_payload(user_id, text):
+async def analyze_conversation_payload(user_id, text):
     prompt = f"""<|user|>Input: "{text}". Extract JSON (category: note/schedule, note: {{heading, summary, category}}, schedule: {{title, start_time}}). Return JSON ONLY.<|end|><|assistant|>"""
     try:
-        response = requests.post(OLLAMA_URL, json={"model": MODEL_NAME, "prompt": prompt, "format": "json", "stream": False})
-        return json.loads(response.json().get("response", "{}"))
-    except: return {"has_data": False}
\ No newline at end of file
+        response = await ollama.generate(prompt, format="json")
+        return json.loads(response or "{}")
+    except Exception: return {"has_data": False}
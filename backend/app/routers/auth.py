@@ -1,10 +1,10 @@
+import asyncio
+from typing import List, Optional
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-import shutil
-import os
-import sqlite3
 from pydantic import BaseModel
-from services.db import get_db
+from services.db import db_reader, db_writer
 from services.voice_auth import voice_security
+from services.audio import read_upload, AudioDecodeError
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -19,68 +19,92 @@ class WakeWordUpdate(BaseModel):
 def verify_password(plain, stored):
     return plain == stored
 
+# Plain def: FastAPI runs these in its threadpool, so a writer waiting on the
+# SQLite lock never blocks the event loop.
 @router.post("/signup")
-async def signup(user: UserAuth):
-    conn = get_db()
-    cur = conn.cursor()
-    try:
+def signup(user: UserAuth):
+    with db_writer() as conn:
+        cur = conn.cursor()
         cur.execute("SELECT user_id FROM users WHERE user_id = ?", (user.user_id,))
         if cur.fetchone():
             raise HTTPException(status_code=400, detail="Username taken")
         cur.execute("INSERT INTO users (user_id, password_hash) VALUES (?, ?)", (user.user_id, user.password))
-        conn.commit()
         return {"status": "success", "message": "User created"}
-    finally:
-        conn.close()
 
 @router.post("/login")
-async def login(user: UserAuth):
-    conn = get_db()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    try:
+def login(user: UserAuth):
+    with db_reader() as conn:
+        cur = conn.cursor()
         cur.execute("SELECT password_hash FROM users WHERE user_id = ?", (user.user_id,))
         row = cur.fetchone()
-        if not row or not verify_password(user.password, row['password_hash']):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        return {"status": "success", "user_id": user.user_id}
-    finally:
-        conn.close()
+    if not row or not verify_password(user.password, row['password_hash']):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    return {"status": "success", "user_id": user.user_id}
 
 @router.post("/set-wake-word")
-async def set_wake_word(data: WakeWordUpdate):
-    conn = get_db()
-    cur = conn.cursor()
-    try:
+def set_wake_word(data: WakeWordUpdate):
+    with db_writer() as conn:
+        cur = conn.cursor()
         clean_word = data.wake_word.strip().lower()
         cur.execute("UPDATE users SET wake_word = ? WHERE user_id = ?", (clean_word, data.user_id))
-        conn.commit()
         return {"status": "success", "message": f"Wake word updated to '{clean_word}'"}
-    finally:
-        conn.close()
 
 # --- VOICE AUTH ---
-@router.post("/enroll-voice")
-async def enroll_voice(file: UploadFile = File(...), user_id: str = Form(...)):
-    temp_filename = f"temp_enroll_{user_id}.wav"
+async def _decode_upload(file: UploadFile):
     try:
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        voice_security.enroll_user(user_id, temp_filename)
-        return {"status": "success", "message": "Voice Signature Saved."}
-    finally:
-        if os.path.exists(temp_filename): os.remove(temp_filename)
+        return await asyncio.to_thread(read_upload, file)
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/enroll-voice")
+async def enroll_voice(
+    user_id: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    files: Optional[List[UploadFile]] = File(None),
+):
+    """Accepts one clip as `file` and/or several as `files`; they are averaged."""
+    uploads = ([file] if file else []) + (files or [])
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No voice sample uploaded.")
+    samples = [await _decode_upload(upload) for upload in uploads]
+    await asyncio.to_thread(voice_security.enroll_user, user_id, samples)
+    return {"status": "success", "message": "Voice Signature Saved.", "samples": len(samples)}
 
 @router.post("/login-voice")
 async def login_with_voice(file: UploadFile = File(...), user_id: str = Form(...)):
-    temp_filename = f"temp_login_{user_id}.wav"
-    try:
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        is_match, score = voice_security.verify_user(user_id, temp_filename)
-        if is_match:
-            return {"status": "success", "message": "Voice Verified", "confidence": score, "user_id": user_id}
-        else:
-            raise HTTPException(status_code=401, detail=f"Voice not recognized. Score: {score:.2f}")
-    finally:
-        if os.path.exists(temp_filename): os.remove(temp_filename)
\ No newline at end of file
+    audio = await _decode_upload(file)
+    is_match, score = await asyncio.to_thread(voice_security.verify_user, user_id, audio)
+    if is_match:
+        return {"status": "success", "message": "Voice Verified", "confidence": score, "user_id": user_id}
+    else:
+        raise HTTPException(status_code=401, detail=f"Voice not recognized. Score: {score:.2f}")
+
+
+@router.post("/verify-voice-batch")
+async def verify_voice_batch(files: List[UploadFile] = File(...), user_ids: List[str] = Form(...)):
+    """Verifies several (user_id, clip) pairs in one call; clips share ECAPA batches."""
+    if len(files) != len(user_ids):
+        raise HTTPException(status_code=400, detail="Send one user_id per file.")
+    samples = [await _decode_upload(f) for f in files]
+    results = await asyncio.to_thread(voice_security.verify_many, list(zip(user_ids, samples)))
+    return {
+        "status": "success",
+        "results": [
+            {"user_id": uid, "verified": is_match, "confidence": score}
+            for uid, (is_match, score) in zip(user_ids, results)
+        ],
+    }
+
+@router.post("/identify-voice")
+async def identify_voice(file: UploadFile = File(...)):
+    """Who is speaking? Matches the clip against every enrolled user."""
+    audio = await _decode_upload(file)
+    user_id, score, candidates = await asyncio.to_thread(voice_security.identify, audio)
+    if user_id is None:
+        raise HTTPException(status_code=404, detail=f"No enrolled speaker matched. Score: {score:.2f}")
+    return {
+        "status": "success",
+        "user_id": user_id,
+        "confidence": score,
+        "candidates": [{"user_id": uid, "score": sc} for uid, sc in candidates],
+    }
\ No newline at end of file
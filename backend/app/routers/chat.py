@@ -1,34 +1,137 @@
 import sys
 import os
-import shutil
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Body
+import json
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from app import stt, nlp
-from services.db_helper import log_chat, save_extracted_data
+from app.advanced_nlp import IntentAnalyzer
+from services.metrics import metrics
+from services.db_helper import log_chat, save_extracted_data, latest_chat_id, get_chat_history
+from services.audio import read_upload, AudioDecodeError
 
 router = APIRouter()
-UPLOAD_DIR = "uploads" # Simplified for reliability
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# --- BACKGROUND EXTRACTION ---
+# Payload extraction does not feed the reply, so it runs alongside response
+# generation and its DB write happens after the reply has been sent.
+# Strong references keep pending tasks from being garbage-collected.
+_background_tasks = set()
+
+async def extract_and_save(user_id, text):
+    try:
+        extracted = await nlp.analyze_conversation_payload(user_id, text)
+        if extracted.get("has_data"):
+            await asyncio.to_thread(save_extracted_data, user_id, extracted)
+    except Exception as e:
+        print(f"❌ Background extraction failed: {e}")
+
+# --- INTENT GATE ---
+# Only commands ("remind me...", "schedule...") carry data worth extracting.
+# Questions, hypotheticals and small talk skip the extraction LLM call.
+intent_analyzer = IntentAnalyzer()
+EXTRACTION_INTENTS = {"command"}
+
+def should_extract(text):
+    intent = intent_analyzer.analyze(text)
+    metrics.incr(f"chat.intent.{intent['type']}")
+    if intent["type"] in EXTRACTION_INTENTS:
+        metrics.incr("chat.extraction.run")
+        return True
+    metrics.incr("chat.extraction.skipped")
+    return False
+
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def run_chat_turn(user_id, text):
+    """One full text turn: log, (maybe) extract in the background, reply, log."""
+    log_chat(user_id, "user", text)
+    if should_extract(text):
+        spawn_background(extract_and_save(user_id, text))
+    ai_response = await nlp.generate_conversational_response(user_id, text)
+    log_chat(user_id, "ai", ai_response)
+    return ai_response
 
 @router.post("/send")
 async def send_chat(user_id: str = Body(...), text: str = Body(...)):
     try:
-        log_chat(user_id, "user", text)
-        extracted = nlp.analyze_conversation_payload(user_id, text)
-        if extracted.get("has_data"):
-            save_extracted_data(user_id, extracted)
-        ai_response = nlp.generate_conversational_response(user_id, text)
-        log_chat(user_id, "ai", ai_response)
+        ai_response = await run_chat_turn(user_id, text)
         return {"status": "success", "ai_response": ai_response}
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/send/stream")
+async def send_chat_stream(user_id: str = Body(...), text: str = Body(...)):
+    """Server-Sent Events: one `token` event per chunk, then a final `done` event."""
+    try:
+        log_chat(user_id, "user", text)
+        if should_extract(text):
+            spawn_background(extract_and_save(user_id, text))
+    except Exception as e: raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_stream():
+        tokens = []
+        async for token in nlp.stream_conversational_response(user_id, text):
+            tokens.append(token)
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        ai_response = "".join(tokens)
+        log_chat(user_id, "ai", ai_response)
+        yield f"data: {json.dumps({'done': True, 'ai_response': ai_response})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/history")
+async def chat_history(
+    request: Request,
+    response: Response,
+    user_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    before_id: Optional[int] = None,
+    since_id: Optional[int] = None,
+):
+    """
+    Paginated chat log, oldest first within a page. Scroll back with
+    `before_id=next_before_id`; poll with `since_id=latest_id`. The ETag
+    changes only when the user has new messages, so polls can get a 304.
+    """
+    latest = await asyncio.to_thread(latest_chat_id, user_id)
+    etag = f'W/"{user_id}-{latest}-{limit}-{before_id}-{since_id}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    messages, has_more = await asyncio.to_thread(get_chat_history, user_id, limit, before_id, since_id)
+    response.headers["ETag"] = etag
+    return {
+        "messages": messages,
+        "has_more": has_more,
+        "next_before_id": messages[0]["id"] if has_more and since_id is None else None,
+        "latest_id": latest,
+    }
+
+def _decode_and_fingerprint(file: UploadFile):
+    audio = read_upload(file)
+    return audio, stt.transcript_key(audio)
+
 @router.post("/upload-audio")
 async def upload_audio(user_id: str = Form(...), file: UploadFile = File(...)):
     try:
-        file_path = os.path.join(UPLOAD_DIR, f"{user_id}_voice.wav")
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        transcript = stt.transcribe_audio(file_path) #
+        # Decoded straight from the upload into a 16 kHz float32 array (no per-user WAV on disk)
+        audio, key = await asyncio.to_thread(_decode_and_fingerprint, file)
+        # Client retries of the same clip are answered from the cache, not Whisper
+        transcript = await stt.transcript_cache.transcribe(key, audio)
         if not transcript: return {"status": "error", "message": "Silence detected."}
-        ai_response = nlp.generate_conversational_response(user_id, transcript)
+        ai_response = await nlp.generate_conversational_response(user_id, transcript)
         return {"status": "success", "transcript": transcript, "ai_response": ai_response}
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except stt.PoolSaturated:
+        raise HTTPException(status_code=429, detail="Transcription queue is full. Retry shortly.",
+                            headers={"Retry-After": "2"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Transcription timed out.")
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-import sqlite3
 import datetime
-import requests # Needed for AI prediction
+from app.llm import ollama # Needed for AI prediction
+from services.db import TIMESTAMP_FORMAT, db_reader, db_writer, to_db_timestamp
+from services.context_cache import context_cache
 
 router = APIRouter()
-DB_PATH = "mindmate.db"
-OLLAMA_URL = "http://localhost:11434/api/generate"
+
+# Columns a client may ask for with ?fields=... (id is always included)
+TIMELINE_FIELDS = ("type", "title", "content", "category", "start_time", "end_time", "is_completed", "updated_at")
 
 class MemoryRequest(BaseModel):
     user_id: str
@@ -15,40 +19,85 @@ class MemoryRequest(BaseModel):
     category: str
     type: str = "note" 
 
-@router.get("/")
-def get_timeline(user_id: str):
+def _timeline_page(user_id, columns, limit, before_id, since):
+    """
+    Newest first. `before_id` pages back with a keyset cursor on
+    idx_timeline_user_id; `since` returns only rows added or changed at or
+    after that time (idx_timeline_user_updated). Returns (rows, has_more).
+    """
+    select = f"SELECT {', '.join(('id',) + columns)} FROM timeline WHERE user_id = ?"
+    params = [user_id]
+    if since is not None:
+        select += " AND updated_at >= ?"
+        params.append(since)
+    if before_id is not None:
+        select += " AND id < ?"
+        params.append(before_id)
+    select += " ORDER BY id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    with db_reader() as conn:
+        rows = [dict(row) for row in conn.execute(select, params).fetchall()]
+    return rows[:limit], len(rows) > limit
+
+@router.get("")
+async def get_timeline(
+    user_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    before_id: Optional[int] = None,
+    since: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Paginated timeline. Pass `next_before_id` back as `before_id` for the
+    next page, and `synced_at` back as `since` to fetch only changes (rows
+    are identified by id, so a client can upsert them).
+    """
+    if fields:
+        columns = tuple(f for f in TIMELINE_FIELDS if f in {x.strip() for x in fields.split(",")})
+    else:
+        columns = TIMELINE_FIELDS
+    if since is not None:
+        since = to_db_timestamp(since)
+        try:
+            datetime.datetime.strptime(since, TIMESTAMP_FORMAT)
+        except ValueError:
+            # Unparseable values come back unchanged and would compare as text
+            raise HTTPException(status_code=400, detail="'since' must be a timestamp, e.g. the last synced_at")
+    synced_at = to_db_timestamp(datetime.datetime.now())
+
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM timeline WHERE user_id = ? ORDER BY id DESC", (user_id,))
-            return {"timeline": [dict(row) for row in cursor.fetchall()]}
+        rows, has_more = await asyncio.to_thread(_timeline_page, user_id, columns, limit, before_id, since)
     except Exception as e:
+        print(f"❌ Timeline query failed: {e}")
         return {"timeline": []}
+    return {
+        "timeline": rows,
+        "has_more": has_more,
+        "next_before_id": rows[-1]["id"] if has_more else None,
+        "synced_at": synced_at,
+    }
 
-@router.post("/")
+@router.post("")
 def add_memory(memory: MemoryRequest):
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            cursor.execute("""
-                INSERT INTO timeline (user_id, type, title, content, category, start_time) 
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (memory.user_id, memory.type, memory.title, memory.content, memory.category, now))
-            conn.commit()
-            return {"status": "success", "message": "Memory added"}
+        with db_writer() as conn:
+            now = to_db_timestamp(datetime.datetime.now())
+            conn.execute("""
+                INSERT INTO timeline (user_id, type, title, content, category, start_time, updated_at) 
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (memory.user_id, memory.type, memory.title, memory.content, memory.category, now, now))
+        context_cache.invalidate(memory.user_id)
+        return {"status": "success", "message": "Memory added"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # ✅ NEW: Schedule Prediction (Moved here to avoid creating new files)
 @router.get("/predict-schedule")
-def predict_schedule(date: str):
+async def predict_schedule(date: str):
     prompt = f"Create a simple daily schedule for {date} as a JSON list."
     try:
-        payload = {"model": "mistral", "prompt": prompt, "stream": False}
-        response = requests.post(OLLAMA_URL, json=payload, timeout=30)
-        ai_text = response.json().get("response", "")
+        ai_text = await ollama.generate(prompt, model="mistral", timeout=30)
         
         # Mock Response to prevent crash if AI output is messy
         mock_schedule = [
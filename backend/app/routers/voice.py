@@ -0,0 +1,155 @@
+import asyncio
+import numpy as np
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from app import stt
+from app.audio_stream import SpeechSegmenter
+from app.wake_word import WakeWordGate, get_wake_word, strip_wake_word
+from app.routers.chat import run_chat_turn
+from services.metrics import metrics
+from services.voice_auth import voice_security
+
+router = APIRouter(tags=["Voice"])
+
+class ListenSession:
+    """
+    One always-listening client. The receive loop only does VAD on incoming
+    PCM; transcription and the chat turn run in a separate task so frames
+    keep flowing while Whisper and the LLM work.
+
+    With `identify` on (a shared household device), each final utterance is
+    matched against the enrolled speakers and routed to that user; unknown
+    voices fall back to the session's user_id.
+
+    With a wake-word gate, nothing reaches the accurate Whisper model (and
+    no partials are decoded) until the user's wake word is heard.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str, identify: bool = False, wake=None):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.identify = identify
+        self.wake = wake
+        self.segmenter = SpeechSegmenter()
+        self.finals = asyncio.Queue()
+        self._send_lock = asyncio.Lock()
+        self._partial_task = None
+
+    async def send(self, payload):
+        async with self._send_lock:
+            await self.websocket.send_json(payload)
+
+    async def receive_loop(self):
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes"):
+                data = message["bytes"]
+                # float32 PCM, 16 kHz mono (see client_recorder.py)
+                pcm = np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+                for kind, audio in self.segmenter.feed(pcm):
+                    if kind == "final":
+                        self.finals.put_nowait(audio)
+                    elif self.wake is None or self.wake.awake:
+                        self.start_partial(audio)
+            elif message.get("text") == "end":
+                audio = self.segmenter.flush()
+                if audio is not None:
+                    self.finals.put_nowait(audio)
+
+    def start_partial(self, audio):
+        # Partials are best effort: skip if the previous one is still decoding
+        if self._partial_task and not self._partial_task.done():
+            metrics.incr("voice.partials_skipped")
+            return
+        self._partial_task = asyncio.create_task(self.send_partial(audio))
+
+    async def send_partial(self, audio):
+        try:
+            text = await stt.transcription_pool.run(stt.transcribe_partial, audio)
+        except (stt.PoolSaturated, asyncio.TimeoutError):
+            metrics.incr("voice.partials_skipped")
+            return
+        if text:
+            await self.send({"type": "partial", "transcript": text})
+
+    async def final_loop(self):
+        while True:
+            audio = await self.finals.get()
+            try:
+                await self.handle_final(audio)
+            except WebSocketDisconnect:
+                return
+            except Exception as e:
+                print(f"❌ Voice stream error: {e}")
+
+    async def resolve_speaker(self, audio):
+        try:
+            speaker, _, _ = await asyncio.to_thread(voice_security.identify, audio)
+        except Exception as e:
+            print(f"⚠️ Speaker identification failed: {e}")
+            speaker = None
+        metrics.incr("voice.speaker_identified" if speaker else "voice.speaker_unknown")
+        return speaker or self.user_id
+
+    async def passes_wake_gate(self, audio):
+        if self.wake.awake:
+            return True   # follow-up command, no wake word needed
+        metrics.incr("voice.wake.checked")
+        try:
+            heard, forward = await stt.transcription_pool.run(self.wake.check, audio)
+        except (stt.PoolSaturated, asyncio.TimeoutError):
+            return False
+        if not heard:
+            metrics.incr("voice.wake.rejected")
+            return False
+        metrics.incr("voice.wake.detected")
+        self.wake.keep_awake()
+        await self.send({"type": "wake", "wake_word": self.wake.wake_word})
+        return forward
+
+    async def handle_final(self, audio):
+        if self.wake and not await self.passes_wake_gate(audio):
+            return
+        speaker_task = asyncio.create_task(self.resolve_speaker(audio)) if self.identify else None
+        try:
+            transcript = await stt.transcription_pool.run(stt.transcribe_audio_chunk, audio)
+        except (stt.PoolSaturated, asyncio.TimeoutError) as e:
+            if speaker_task:
+                speaker_task.cancel()
+            message = "Transcription queue is full." if isinstance(e, stt.PoolSaturated) else "Transcription timed out."
+            await self.send({"type": "error", "message": message})
+            return
+
+        # Identification runs alongside Whisper, so it adds no latency here
+        user_id = await speaker_task if speaker_task else self.user_id
+        if self.wake and transcript:
+            transcript = strip_wake_word(transcript, self.wake.wake_word)   # the LLM gets the command only
+        if not transcript:
+            return
+        metrics.incr("voice.finals")
+        if self.wake:
+            self.wake.keep_awake()
+        await self.send({"type": "final", "transcript": transcript, "user_id": user_id})
+        ai_response = await run_chat_turn(user_id, transcript)
+        await self.send({"type": "response", "transcript": transcript, "ai_response": ai_response, "user_id": user_id})
+
+    def close(self):
+        if self._partial_task:
+            self._partial_task.cancel()
+
+@router.websocket("/ws/listen/{user_id}")
+async def listen(websocket: WebSocket, user_id: str, identify: bool = False, wake: bool = True):
+    """`wake=false` disables the wake-word gate (e.g. push-to-talk clients)."""
+    await websocket.accept()
+    gate = WakeWordGate(await asyncio.to_thread(get_wake_word, user_id)) if wake else None
+    session = ListenSession(websocket, user_id, identify, gate)
+    worker = asyncio.create_task(session.final_loop())
+    try:
+        await session.receive_loop()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker.cancel()
+        session.close()
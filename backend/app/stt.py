@@ -1,6 +1,15 @@
 import os
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from faster_whisper import WhisperModel
+from services.registry import registry
+from services.metrics import metrics
+from services.audio import decode_audio
 
 # --- CONFIG FOR ACCURACY ---
 # 1. UPGRADE MODEL: "small.en" is much smarter than "base" but still fast on Ryzen 7.
@@ -8,44 +17,213 @@ MODEL_SIZE = "small.en"
 DEVICE = "cpu"
 COMPUTE_TYPE = "int8" 
 
-print(f"⏳ Loading Smarter Whisper Model ({MODEL_SIZE})...")
-model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE)
-print("✅ Whisper Model Loaded! Ready.")
+# --- MODEL TIERS ---
+# "fast" serves wake words, live partials and short commands; "accurate"
+# serves dictation. Clips up to SHORT_UTTERANCE_SECONDS use the short plan.
+MODEL_TIERS = {
+    "fast": os.getenv("MINDMATE_STT_FAST_MODEL", "tiny.en"),
+    "accurate": os.getenv("MINDMATE_STT_MODEL", MODEL_SIZE),
+}
+SHORT_UTTERANCE_SECONDS = float(os.getenv("MINDMATE_STT_SHORT_SECONDS", "3"))
+SHORT_TIER = os.getenv("MINDMATE_STT_SHORT_TIER", "fast")
+SAMPLE_RATE = 16000
 
-def transcribe_audio_chunk(audio_data: np.ndarray):
+# --- WORKER POOL CONFIG ---
+# CTranslate2 releases the GIL, so threads run decodes in parallel. Each
+# worker gets an equal share of the cores instead of all of them fighting.
+CPU_CORES = os.cpu_count() or 1
+STT_WORKERS = int(os.getenv("MINDMATE_STT_WORKERS", str(max(1, min(4, CPU_CORES // 4)))))
+STT_QUEUE_SIZE = int(os.getenv("MINDMATE_STT_QUEUE", "8"))     # jobs allowed to wait
+STT_TIMEOUT = float(os.getenv("MINDMATE_STT_TIMEOUT", "60"))   # seconds per request
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("MINDMATE_STT_CACHE_SIZE", "512"))  # cached transcripts
+CPU_THREADS = max(1, CPU_CORES // STT_WORKERS)
+
+# --- DECODING OPTIONS (shared by every entry point) ---
+# This tells the AI exactly what words to expect.
+# It fixes name recognition (Abhijith) and domain words (MindMate).
+PROMPT = "User is Abhijith NB. He is speaking to his assistant MindMate. Topics: Coding, Schedule, Emails, Reminders."
+TRANSCRIBE_OPTIONS = dict(
+    language="en",
+    condition_on_previous_text=False,   # CRITICAL: Prevents getting stuck on old text
+    initial_prompt=PROMPT,              # Apply the context hint
+    vad_filter=True,
+    vad_parameters=dict(min_silence_duration_ms=400),
+)
+# Short commands: one greedy pass, no temperature fallback retries
+GREEDY_OPTIONS = dict(beam_size=1, best_of=1, temperature=0.0)
+# Dictation: BEAM SEARCH looks for best accuracy (Default was 1)
+BEAM_OPTIONS = dict(beam_size=5)
+
+def _whisper_loader(tier):
+    def load():
+        # Imported here so importing this module stays cheap
+        from faster_whisper import WhisperModel
+        size = MODEL_TIERS[tier]
+        print(f"⏳ Loading Whisper Model ({size}, {tier})...")
+        model = WhisperModel(size, device=DEVICE, compute_type=COMPUTE_TYPE,
+                             cpu_threads=CPU_THREADS, num_workers=STT_WORKERS)
+        print(f"✅ Whisper Model {size} Loaded! Ready.")
+        return model
+    return load
+
+# "whisper" keeps its name in /ready; the fast tier is registered alongside it
+registry.register("whisper", _whisper_loader("accurate"))
+registry.register("whisper-fast", _whisper_loader("fast"))
+
+def get_model(tier="accurate"):
+    """The shared Whisper model for a tier, loaded on first use."""
+    return registry.get("whisper" if tier == "accurate" else "whisper-fast")
+
+def decoding_plan(audio: np.ndarray, tier=None):
+    """Picks (tier, options): greedy for short clips, beam search for dictation."""
+    if len(audio) / SAMPLE_RATE <= SHORT_UTTERANCE_SECONDS:
+        return tier or SHORT_TIER, {**TRANSCRIBE_OPTIONS, **GREEDY_OPTIONS}
+    return tier or "accurate", {**TRANSCRIBE_OPTIONS, **BEAM_OPTIONS}
+
+def transcribe(audio, tier=None, **overrides):
+    """
+    Core transcription used by every entry point. `audio` is a decoded
+    16 kHz float32 array (or a path, decoded here); `tier` forces a model.
+    """
+    if not isinstance(audio, np.ndarray):
+        audio = decode_audio(audio)
+    tier, options = decoding_plan(audio, tier)
+    options.update(overrides)
+    metrics.incr(f"stt.tier.{tier}")
+    segments, _ = get_model(tier).transcribe(audio, **options)
+    return " ".join([segment.text for segment in segments]).strip()
+
+def transcribe_audio_chunk(audio_data: np.ndarray, tier=None, **overrides):
     """
     High-Accuracy Real-time Transcription
     """
     try:
-        # 2. DEFINING CONTEXT
-        # This tells the AI exactly what words to expect.
-        # It fixes name recognition (Abhijith) and domain words (MindMate).
-        prompt = "User is Abhijith NB. He is speaking to his assistant MindMate. Topics: Coding, Schedule, Emails, Reminders."
-
-        segments, info = model.transcribe(
-            audio_data, 
-            beam_size=5,                # 3. BEAM SEARCH: Look for best accuracy (Default was 1)
-            language="en",
-            condition_on_previous_text=False, # CRITICAL: Prevents getting stuck on old text
-            initial_prompt=prompt,      # Apply the context hint
-            vad_filter=True,
-            vad_parameters=dict(min_silence_duration_ms=400)
-        )
-        
-        text = " ".join([segment.text for segment in segments]).strip()
-        
+        text = transcribe(audio_data, tier, **overrides)
+
         # Debug Log to see what it heard
         if text:
-            print(f"👂 HIGH-ACCURACY HEARD: '{text}'")
-            
+            print(f"👂 HEARD ({len(audio_data) / SAMPLE_RATE:.1f}s): '{text}'")
+
         return text
 
     except Exception as e:
         print(f"❌ Transcription Error: {e}")
         return ""
 
+def transcribe_partial(audio_data: np.ndarray):
+    """Live preview while the user is still talking: always the fast tier."""
+    return transcribe_audio_chunk(audio_data, tier="fast", **GREEDY_OPTIONS)
+
 # Keep legacy function for file uploads
-def transcribe_audio(file_path: str):
-    if not os.path.exists(file_path): return ""
-    segments, _ = model.transcribe(file_path, beam_size=5)
-    return " ".join([segment.text for segment in segments]).strip()
\ No newline at end of file
+def transcribe_audio(audio):
+    """`audio` is a file path or an already decoded 16 kHz float32 array."""
+    if isinstance(audio, str) and not os.path.exists(audio): return ""
+    return transcribe(audio)
+
+# --- TRANSCRIPTION WORKER POOL ---
+class PoolSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+class TranscriptionPool:
+    """
+    Runs blocking Whisper jobs on a dedicated thread pool so the event loop
+    stays free. At most `workers` jobs run and `max_queue` wait; anything
+    beyond that is rejected immediately (the API answers 429).
+    """
+
+    def __init__(self, workers=STT_WORKERS, max_queue=STT_QUEUE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    async def run(self, fn, *args, timeout=STT_TIMEOUT):
+        if not self._slots.acquire(blocking=False):
+            metrics.incr("stt.rejected")
+            raise PoolSaturated()
+
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            metrics.observe("stt.queue_wait", started - submitted)
+            try:
+                return fn(*args)
+            finally:
+                metrics.observe("stt.run", time.perf_counter() - started)
+
+        future = self._executor.submit(job)
+        # The slot is freed when the job really ends, even if the caller timed out
+        future.add_done_callback(lambda _: self._slots.release())
+        metrics.incr("stt.jobs")
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            metrics.incr("stt.timeouts")
+            raise
+        finally:
+            metrics.observe("stt.total", time.perf_counter() - submitted)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+transcription_pool = TranscriptionPool()
+
+# --- TRANSCRIPT CACHE ---
+def transcript_key(audio: np.ndarray, tier=None):
+    """
+    Content address for a transcription: hash of the decoded PCM plus the
+    model and options that would be used for it. Re-encoded retries of the
+    same recording hash the same; a model or option change misses.
+    """
+    tier, options = decoding_plan(audio, tier)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+    digest.update(json.dumps([MODEL_TIERS[tier], COMPUTE_TYPE, options], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+class TranscriptCache:
+    """LRU of transcript_key -> text, capped at `max_entries`."""
+
+    def __init__(self, max_entries=TRANSCRIPT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}          # key -> task, so concurrent retries share one job
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+        metrics.incr("stt.cache.hits" if text is not None else "stt.cache.misses")
+        return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def transcribe(self, key, audio):
+        """Cached `transcribe_audio` on the worker pool (pool errors propagate)."""
+        text = self.get(key)
+        if text is not None:
+            return text
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(transcription_pool.run(transcribe_audio, audio))
+            self._inflight[key] = task
+
+            def done(t):
+                self._inflight.pop(key, None)
+                if not t.cancelled() and t.exception() is None:
+                    self.put(key, t.result())
+            task.add_done_callback(done)
+        else:
+            metrics.incr("stt.cache.coalesced")
+
+        # shield: one caller giving up must not cancel the job for the others
+        return await asyncio.shield(task)
+
+transcript_cache = TranscriptCache()
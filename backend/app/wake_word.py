@@ -0,0 +1,95 @@
+import re
+import time
+from difflib import SequenceMatcher
+from app import stt
+from services.db import db_reader
+
+# --- WAKE WORD CONFIG ---
+DEFAULT_WAKE_WORD = "mindmate"      # users.wake_word default
+WAKE_WINDOW_SECONDS = 2.0           # only the start of an utterance is checked
+FOLLOW_UP_SECONDS = 8.0             # stay awake this long after a command
+MATCH_RATIO = 0.75                  # fuzzy match: tiny.en often splits/misspells names
+SEARCH_WORDS = 4                    # wake word must be within the first few words
+
+def get_wake_word(user_id: str) -> str:
+    try:
+        with db_reader() as conn:
+            row = conn.execute("SELECT wake_word FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row and row[0]:
+            return row[0].strip().lower()
+    except Exception:
+        pass  # Older users tables have no wake_word column
+    return DEFAULT_WAKE_WORD
+
+def _words(text: str):
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+def _wake_word_end(text: str, wake_word: str):
+    """
+    Looks for the wake word among the first SEARCH_WORDS words of `text`,
+    ignoring spacing ("mind mate" == "mindmate") and small misspellings.
+    Returns the offset in `text` just past it, or None if it was not heard.
+    """
+    target = "".join(_words(wake_word))
+    words = list(re.finditer(r"[a-z0-9']+", text, re.IGNORECASE))
+    if not target or not words:
+        return None
+
+    for start in range(min(SEARCH_WORDS, len(words))):
+        for end in range(start + 1, min(start + 4, len(words)) + 1):
+            candidate = "".join(w.group().lower() for w in words[start:end])
+            if SequenceMatcher(None, candidate, target).ratio() >= MATCH_RATIO:
+                return words[end - 1].end()
+    return None
+
+def find_wake_word(text: str, wake_word: str):
+    """Returns the words spoken after the wake word, or None if it was not heard."""
+    end = _wake_word_end(text, wake_word)
+    return None if end is None else " ".join(_words(text[end:]))
+
+def strip_wake_word(text: str, wake_word: str):
+    """`text` without its leading "hey mindmate," (unchanged if the wake word is not in it)."""
+    end = _wake_word_end(text, wake_word)
+    return text if end is None else text[end:].lstrip(" ,.!?;:-")
+
+class WakeWordGate:
+    """
+    Cheap always-on stage in front of full transcription.
+
+    The energy VAD (SpeechSegmenter) already drops silence; each utterance
+    it produces is then checked here by decoding only its first
+    WAKE_WINDOW_SECONDS with the fast Whisper tier, greedy, biased towards
+    the wake word. Only utterances that start with the wake word, or that
+    arrive within FOLLOW_UP_SECONDS of the last command, reach the
+    accurate model.
+    """
+
+    def __init__(self, wake_word: str = DEFAULT_WAKE_WORD):
+        self.wake_word = wake_word
+        self._awake_until = 0.0
+
+    @property
+    def awake(self):
+        return time.monotonic() < self._awake_until
+
+    def keep_awake(self):
+        self._awake_until = time.monotonic() + FOLLOW_UP_SECONDS
+
+    def sleep(self):
+        self._awake_until = 0.0
+
+    def check(self, audio):
+        """
+        Blocking keyword check (run it on the transcription pool).
+        Returns (heard, forward): `forward` is False when the utterance was
+        only the wake word, so there is nothing to transcribe in full.
+        """
+        window = int(WAKE_WINDOW_SECONDS * stt.SAMPLE_RATE)
+        head = stt.transcribe(
+            audio[:window], tier="fast", initial_prompt=self.wake_word,
+            vad_filter=False, **stt.GREEDY_OPTIONS
+        )
+        rest = find_wake_word(head, self.wake_word)
+        if rest is None:
+            return False, False
+        return True, bool(rest) or len(audio) > window
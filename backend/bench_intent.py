@@ -0,0 +1,30 @@
+import os
+import sys
+import timeit
+
+# Add backend root to path so 'app' is visible
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.advanced_nlp import IntentAnalyzer
+
+SAMPLES = [
+    "When is my dentist appointment?",
+    "Suppose I skip the gym today",
+    "Remind me to call mom at 6",
+    "Send an email to bob about the report",
+    "I had a really long day honestly",
+    "yeah okay sounds good",
+]
+
+def run_benchmark(rounds=20000):
+    analyzer = IntentAnalyzer()
+
+    single = timeit.timeit(lambda: [analyzer.analyze(t) for t in SAMPLES], number=rounds)
+    batch = timeit.timeit(lambda: analyzer.analyze_many(SAMPLES), number=rounds)
+
+    calls = rounds * len(SAMPLES)
+    print(f"⏱️ analyze():      {single / calls * 1e6:.2f} µs/call")
+    print(f"⏱️ analyze_many(): {batch / calls * 1e6:.2f} µs/text")
+
+if __name__ == "__main__":
+    run_benchmark()
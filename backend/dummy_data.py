@@ -1,6 +1,7 @@
 import sqlite3
 import datetime
 import os
+from services.migrations import migrate
 
 # 🟢 CONFIGURATION
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -25,34 +26,12 @@ def seed_data():
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
 
-        # --- 1. DROP OLD TABLES (CRITICAL FIX) ---
-        # This deletes the old 'users' table so we can recreate it with the 'password' column
-        print("\n💥 Dropping old tables to update schema...")
-        cursor.execute("DROP TABLE IF EXISTS users")
-        cursor.execute("DROP TABLE IF EXISTS timeline")
-        cursor.execute("DROP TABLE IF EXISTS messages")
+        # --- 1. BRING THE SCHEMA UP TO DATE ---
+        # Same versioned migrations the API runs on startup (no more DROP TABLE)
+        print("\n🛠️ Migrating schema...")
+        migrate(conn)
 
-        # --- 2. CREATE TABLES (New Structure) ---
-        print("🛠️ Creating new tables...")
-        cursor.execute("CREATE TABLE users (user_id TEXT PRIMARY KEY, password TEXT)")
-        
-        cursor.execute("""
-            CREATE TABLE timeline (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT,
-                type TEXT,
-                title TEXT,
-                content TEXT, 
-                category TEXT,
-                start_time TEXT,
-                end_time TEXT,
-                is_completed BOOLEAN DEFAULT 0
-            )
-        """)
-        
-        cursor.execute("CREATE TABLE messages (id INTEGER PRIMARY KEY, user_id TEXT, sender TEXT, text TEXT)")
-
-        # --- 3. DEFINE DATA ---
+        # --- 2. DEFINE DATA ---
         users_data = [
             {
                 "user_id": "admin",
@@ -108,12 +87,16 @@ def seed_data():
             }
         ]
 
-        # --- 4. INSERT DATA ---
+        # --- 3. INSERT DATA ---
         print("🚀 Inserting data for 3 users...")
         
         for user in users_data:
+            # Reset this demo user (re-running the seed is safe)
+            for table in ("timeline", "chat_messages", "users"):
+                cursor.execute(f"DELETE FROM {table} WHERE user_id = ?", (user['user_id'],))
+
             # Insert User
-            cursor.execute("INSERT INTO users (user_id, password) VALUES (?, ?)", (user['user_id'], user['pass']))
+            cursor.execute("INSERT INTO users (user_id, password_hash) VALUES (?, ?)", (user['user_id'], user['pass']))
             
             # Insert Timeline
             for item in user['timeline']:
@@ -125,12 +108,12 @@ def seed_data():
             # Insert Chat
             for msg in user['chat']:
                 cursor.execute("""
-                    INSERT INTO messages (user_id, sender, text) 
+                    INSERT INTO chat_messages (user_id, sender, text) 
                     VALUES (?, ?, ?)
                 """, (user['user_id'], msg[0], msg[1]))
 
         conn.commit()
-        print(f"\n✅ SUCCESS! Database schema updated and seeded.")
+        print(f"\n✅ SUCCESS! Database migrated and seeded.")
 
     except Exception as e:
         print(f"\n❌ ERROR: {e}")
@@ -1,11 +1,24 @@
 import os
-import sqlite3
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, chat, memories,dashboard
+from starlette.formparsers import MultiPartParser
+from app.routers import auth, chat, memories,dashboard, voice
+from app import stt
+from app.llm import ollama
+from services.db import db_writer, close_pools
+from services.migrations import migrate
+from services.write_queue import write_queue
+from services.vectors import vector_index
+from services.metrics import metrics
+from services.registry import registry
+from services.audio import UPLOAD_SPOOL_MAX_BYTES
+from services.voice_auth import voice_security
 
 app = FastAPI(title="MindMate API")
 
+# Keep typical voice uploads in memory; only larger ones spool to disk
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_MAX_BYTES
+
 # 🟢 CORS Middleware for Flutter connection
 app.add_middleware(
     CORSMiddleware,
@@ -15,39 +28,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "db", "mindmate.db")
+app.include_router(auth.router)
+app.include_router(chat.router, prefix="/chat", tags=["Chat"])
+app.include_router(memories.router, prefix="/memories", tags=["Memories"])
+app.include_router(dashboard.router)
+app.include_router(voice.router)
+
+# Load heavy models in the background once the worker is up (MINDMATE_WARMUP=0 disables)
+WARMUP_ON_STARTUP = os.getenv("MINDMATE_WARMUP", "1") == "1"
 
 @app.on_event("startup")
 def on_startup():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, password TEXT)")
-        
-        # 🟢 CRITICAL: This table is required for Dr. Sarah / Chef Mario tests
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT,
-                category TEXT,
-                title TEXT,
-                summary TEXT,
-                original_text TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Existing events/timeline table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT, title TEXT, category TEXT, 
-                start_time TEXT, end_time TEXT, location_name TEXT
-            )
-        """)
-        conn.commit()
-    print(f"✅ Database Initialized with 'notes' and 'events' tables.")
+    # One versioned schema for the app, init_db.py and dummy_data.py
+    with db_writer() as conn:
+        version = migrate(conn)
+    print(f"✅ Database ready (schema version {version}).")
+
+    if WARMUP_ON_STARTUP:
+        registry.warm_up()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await ollama.aclose()
+    stt.transcription_pool.shutdown()
+    voice_security.batcher.shutdown()
+    write_queue.shutdown()   # commit queued writes before the pool closes
+    vector_index.shutdown()
+    close_pools()
+
+@app.get("/ready")
+def readiness():
+    """Which models are in memory. Requests still work while warming; they load on demand."""
+    models = registry.status()
+    if all(m["loaded"] for m in models.values()): status = "ready"
+    elif any(m["error"] for m in models.values()): status = "degraded"
+    else: status = "warming"
+    return {"status": status, "models": models}
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
 
 if __name__ == "__main__":
     import uvicorn
@@ -41,8 +41,35 @@ class AI_Assistant:
             print(f"⚠️ Prediction Error: {e}")
             return 4 # Default to 'Rest' on error
 
+    def predict_batch(self, features):
+        """
+        Predicts many [Hour, DayOfWeek, Month, Location, Fatigue, PrevActivity]
+        rows in ONE model call (each sklearn call has a large fixed overhead).
+        """
+        try:
+            return self.model.predict(np.asarray(features)).astype(int)
+        except Exception as e:
+            print(f"⚠️ Prediction Error: {e}")
+            return np.full(len(features), 4) # Default to 'Rest' on error
+
+    def transition_table(self, day_of_week, month):
+        """
+        table[hour, prev_activity_id] -> next activity id, for all 24 hours and
+        every possible previous activity, from a single predict call.
+        """
+        n_prev = len(self.activity_map)
+        hours, prevs = np.meshgrid(np.arange(24), np.arange(n_prev), indexing="ij")
+        features = np.column_stack([
+            hours.ravel(),
+            np.full(hours.size, day_of_week),
+            np.full(hours.size, month),
+            np.full(hours.size, self.default_location),
+            np.full(hours.size, self.default_fatigue),
+            prevs.ravel()
+        ])
+        return self.predict_batch(features).reshape(24, n_prev)
+
     def generate_day_schedule(self, date_str):
-        current_activity_id = 0
         """
         Predicts the TIMETABLE for a specific future date.
         """
@@ -53,15 +80,16 @@ class AI_Assistant:
         print(f"\n📅 Generating Schedule for: {target_date.date().strftime('%A, %B %d')}")
         print("-" * 50)
         
+        # One model call for the whole day; the hourly chain is a table walk
+        table = self.transition_table(day_of_week, month)
+
         schedule = []
         # Start the day assuming you were Sleeping (Activity 0)
         current_activity_id = 0 
         
-        # Loop through 24 hours
         # Loop through 24 hours
         for hour in range(24):
-            # Call the model ONCE and store it in next_id
-            next_id = self.predict_activity(hour, day_of_week, month, current_activity_id)
+            next_id = int(table[hour, current_activity_id]) if current_activity_id < table.shape[1] else 4
             
             # Use next_id to get the name
             activity_name = self.inv_activity_map.get(next_id, "Unknown")
@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+import joblib
+import numpy as np
+
+# How often (seconds) to stat the model file for changes
+RELOAD_CHECK_INTERVAL = 5.0
+
+class HabitLookupTable:
+    """
+    Compiled lookup mode for the habit models.
+
+    The model's input space is a small discrete grid, so every cell is
+    predicted once (one predict_proba call) and later predictions are plain
+    array indexing. The table is rebuilt automatically when the model file
+    changes on disk (checked at most every RELOAD_CHECK_INTERVAL seconds).
+
+    `shape` is the grid size per axis and `build_features` turns an (n, ndim)
+    array of grid indices into the model's feature matrix.
+    """
+
+    def __init__(self, model_path, shape, build_features, check_interval=RELOAD_CHECK_INTERVAL):
+        self.model_path = model_path
+        self.shape = tuple(shape)
+        self.build_features = build_features
+        self.check_interval = check_interval
+        self._state = None          # (model, predictions, probabilities)
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _build(self):
+        model = joblib.load(self.model_path)
+        grid = np.indices(self.shape).reshape(len(self.shape), -1).T
+        proba = np.asarray(model.predict_proba(self.build_features(grid)), dtype=np.float32)
+        classes = np.asarray(model.classes_).astype(np.int16)
+        predictions = classes[proba.argmax(axis=1)].reshape(self.shape)
+        return model, predictions, proba.reshape(*self.shape, -1)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._state is not None and now < self._next_check:
+            return
+        with self._lock:
+            self._next_check = now + self.check_interval
+            try:
+                mtime = os.stat(self.model_path).st_mtime
+            except OSError:
+                return
+            if not force and mtime == self._mtime:
+                return
+            try:
+                self._state = self._build()
+                self._mtime = mtime
+                print(f"✅ Habit lookup table compiled: {self.shape} from {self.model_path}")
+            except Exception as e:
+                print(f"❌ Could not compile habit lookup table: {e}")
+
+    def covers(self, index):
+        return all(0 <= i < n for i, n in zip(index, self.shape))
+
+    @property
+    def loaded(self):
+        """True once a table has been compiled (does not trigger a build)."""
+        return self._state is not None
+
+    @property
+    def ready(self):
+        self.refresh()
+        return self._state is not None
+
+    @property
+    def model(self):
+        self.refresh()
+        return self._state[0] if self._state else None
+
+    @property
+    def predictions(self):
+        """Predicted class for every grid cell, shaped like the grid."""
+        self.refresh()
+        return self._state[1] if self._state else None
+
+    def predict(self, index):
+        return int(self.predictions[tuple(index)])
+
+    def predict_proba(self, index):
+        self.refresh()
+        return self._state[2][tuple(index)]
@@ -1,19 +1,38 @@
 import joblib
 import os
 import numpy as np
+from models.lookup import HabitLookupTable
 
 # Adjust path to find the models folder relative to this file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Mappings (Must match features.py)
+location_map = {'Home': 0, 'Office': 1, 'Library': 2, 'Transit': 3}
+fatigue_map = {'Low': 0, 'Medium': 1, 'High': 2}
+activity_map = {'Sleep': 0, 'Breakfast': 1, 'Study': 2, 'Work': 3, 'Rest': 4, 'Gym': 5}
+SLOT_MINUTES = 30 # Same slot size the training data uses (features.py)
+
+def _grid_features(grid):
+    slot, day, prev, loc, fat = grid.T
+    hour = slot * SLOT_MINUTES / 60
+    return np.column_stack([np.sin(2 * np.pi * hour / 24), np.cos(2 * np.pi * hour / 24),
+                            day, prev, loc, fat])
+
+# Compiled lookup: every (slot, day, prev, location, fatigue) cell predicted once.
+# The habit model is loaded (and reloaded on change) through this table.
+lookup = HabitLookupTable(
+    os.path.join(BASE_DIR, "habit_model.pkl"),
+    (24 * 60 // SLOT_MINUTES, 7, len(activity_map), len(location_map), len(fatigue_map)),
+    _grid_features
+)
+
 # Load the trained models (Ensure you have run training first!)
 try:
-    model = joblib.load(os.path.join(BASE_DIR, "habit_model.pkl"))
     prev_enc = joblib.load(os.path.join(BASE_DIR, "prev_encoder.pkl"))
     next_enc = joblib.load(os.path.join(BASE_DIR, "next_encoder.pkl"))
     print("✅ ML Models loaded successfully.")
 except FileNotFoundError:
     print("⚠️ Warning: ML models not found. Run training script first.")
-    model = None
 
 class MindMateModel:
     def __init__(self, model_path=None):
@@ -24,6 +43,7 @@ class MindMateModel:
         """
         Predicts the likely activity for the given context.
         """
+        model = lookup.model
         if not model:
             return []
 
@@ -33,11 +53,6 @@ class MindMateModel:
         hour_cos = np.cos(2 * np.pi * hour / 24)
         day_of_week = custom_time.weekday()
         
-        # Mappings (Must match features.py)
-        location_map = {'Home': 0, 'Office': 1, 'Library': 2, 'Transit': 3}
-        fatigue_map = {'Low': 0, 'Medium': 1, 'High': 2}
-        activity_map = {'Sleep': 0, 'Breakfast': 1, 'Study': 2, 'Work': 3, 'Rest': 4, 'Gym': 5}
-
         # Encode Inputs
         loc_code = location_map.get(current_location, 0)
         fat_code = fatigue_map.get(current_fatigue, 0)
@@ -47,7 +62,12 @@ class MindMateModel:
         X_input = [[hour_sin, hour_cos, day_of_week, prev_code, loc_code, fat_code]]
 
         # 2. Predict Probabilities
-        probs = model.predict_proba(X_input)[0]
+        # Slot-aligned times are an O(1) table read; anything else runs the model
+        index = ((custom_time.hour * 60 + custom_time.minute) // SLOT_MINUTES, day_of_week, prev_code, loc_code, fat_code)
+        if custom_time.minute % SLOT_MINUTES == 0 and lookup.covers(index):
+            probs = lookup.predict_proba(index)
+        else:
+            probs = model.predict_proba(X_input)[0]
         
         # 3. Format Output
         predictions = []
@@ -1,28 +1,25 @@
 # services/analytics.py
-from services.db import get_db
+from services.db import db_reader, day_range
 from datetime import datetime
 
 def get_daily_summary(user_id: str):
     """
     Returns a calculated summary of today's activities and stats.
     """
-    conn = get_db()
-    conn.row_factory = None 
-    cur = conn.cursor()
-    
     today_str = datetime.now().strftime("%Y-%m-%d")
+    day_start, day_end = day_range(today_str)
     
     # 1. Fetch today's completed events
-    cur.execute("""
-        SELECT title, category, start_time 
-        FROM events 
-        WHERE user_id = ? 
-        AND start_time LIKE ? 
-        ORDER BY start_time ASC
-    """, (user_id, f"{today_str}%"))
-    
-    events = cur.fetchall()
-    conn.close()
+    with db_reader() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT title, category, start_time 
+            FROM events 
+            WHERE user_id = ? 
+            AND start_time >= ? AND start_time < ?
+            ORDER BY start_time ASC
+        """, (user_id, day_start, day_end))
+        events = cur.fetchall()
 
     if not events:
         return {
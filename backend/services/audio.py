@@ -0,0 +1,54 @@
+# services/audio.py
+import io
+import os
+from math import gcd
+import numpy as np
+import soundfile as sf
+
+# --- CONFIG ---
+TARGET_RATE = 16000   # Whisper and ECAPA both expect 16 kHz mono
+# Multipart uploads stay in RAM up to this size and only then spill to a temp
+# file (starlette's default is 1 MB, which most voice clips exceed).
+UPLOAD_SPOOL_MAX_BYTES = int(os.getenv("MINDMATE_UPLOAD_SPOOL_BYTES", str(8 * 1024 * 1024)))
+
+class AudioDecodeError(ValueError):
+    """The uploaded bytes are not audio we can decode."""
+
+def resample(audio: np.ndarray, src_rate: int, dst_rate: int = TARGET_RATE):
+    if src_rate == dst_rate:
+        return audio
+    try:
+        from scipy.signal import resample_poly
+        g = gcd(src_rate, dst_rate)
+        return resample_poly(audio, dst_rate // g, src_rate // g).astype(np.float32)
+    except ImportError:
+        # Linear interpolation fallback (fine for speech)
+        duration = len(audio) / src_rate
+        positions = np.arange(int(duration * dst_rate)) * (src_rate / dst_rate)
+        return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+def decode_audio(source) -> np.ndarray:
+    """
+    Decodes a path, bytes or binary file object to mono float32 at 16 kHz,
+    entirely in memory. WAV/FLAC/OGG go through libsndfile; anything else
+    (m4a/aac from mobile recorders) falls back to PyAV via faster-whisper.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    try:
+        data, rate = sf.read(source, dtype="float32", always_2d=True)
+        return resample(data.mean(axis=1), rate)
+    except Exception:
+        if hasattr(source, "seek"):
+            source.seek(0)
+
+    try:
+        from faster_whisper.audio import decode_audio as av_decode
+        return av_decode(source, sampling_rate=TARGET_RATE)
+    except Exception as e:
+        raise AudioDecodeError(f"Unsupported or corrupt audio: {e}") from e
+
+def read_upload(upload) -> np.ndarray:
+    """Decodes a FastAPI UploadFile without copying it to our own file on disk."""
+    upload.file.seek(0)
+    return decode_audio(upload.file)
@@ -0,0 +1,102 @@
+# services/batcher.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from services.metrics import metrics
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching in front of a model.
+
+    Callers submit single items from any thread and get a Future back. A
+    worker thread takes the first waiting item, keeps collecting for up to
+    `max_wait_ms` (or until `max_batch` items), then calls
+    `process(items) -> results` once for the whole batch and fans the
+    results back out (a result that is an exception instance is raised to
+    that caller only). Under load this amortizes per-call overhead; a lone
+    request only pays the short wait.
+    """
+
+    def __init__(self, process, max_batch=16, max_wait_ms=8, name="batcher"):
+        self.process = process
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def map(self, items, timeout=None):
+        """Submits several items at once (they share batches) and waits for all."""
+        futures = [self.submit(item) for item in items]
+        return [f.result(timeout) for f in futures]
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # Drop requests whose caller cancelled while they were queued
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, submitted in batch:
+                metrics.observe(f"{self.name}.queue_wait", started - submitted)
+            metrics.incr(f"{self.name}.batches")
+            metrics.incr(f"{self.name}.items", len(batch))
+
+            try:
+                results = self.process([item for item, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                metrics.observe(f"{self.name}.run", time.perf_counter() - started)
+
+            for (_, future, _), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def shutdown(self):
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
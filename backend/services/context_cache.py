@@ -0,0 +1,59 @@
+# services/context_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from services.metrics import metrics
+
+# --- CONFIG ---
+CONTEXT_TTL = float(os.getenv("MINDMATE_CONTEXT_TTL", "120"))   # seconds
+CONTEXT_CACHE_USERS = 1024                                      # users kept in memory
+
+class ContextCache:
+    """
+    Per-user prompt context (background, schedule, habit insight) reused
+    across the turns of a conversation. Entries expire after CONTEXT_TTL
+    and are dropped immediately by invalidate(), which the write paths call
+    when a user's events, notes or memories change.
+    """
+
+    def __init__(self, ttl=CONTEXT_TTL, max_users=CONTEXT_CACHE_USERS):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._entries = OrderedDict()           # user_id -> (expires_at, key, value)
+        self._generations = defaultdict(int)    # bumped on every invalidate
+        self._lock = threading.Lock()
+
+    def get(self, user_id, build, key=None):
+        """
+        Cached `build()` for this user. `key` is extra validity (e.g. the
+        current hour): an entry built under a different key is rebuilt.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now and entry[1] == key:
+                self._entries.move_to_end(user_id)
+                metrics.incr("context.cache.hits")
+                return entry[2]
+            generation = self._generations[user_id]
+
+        metrics.incr("context.cache.misses")
+        value = build()
+
+        with self._lock:
+            # A write that landed while we were building makes this value stale
+            if self._generations[user_id] == generation:
+                self._entries[user_id] = (now + self.ttl, key, value)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generations[user_id] += 1
+            self._entries.pop(user_id, None)
+        metrics.incr("context.cache.invalidations")
+
+context_cache = ContextCache()
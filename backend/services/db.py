@@ -1,19 +1,211 @@
 import sqlite3
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
 
 # 1. Define the path to the database file
 # This points to backend/db/mindmate.db
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, "db", "mindmate.db")
 
+# --- POOL CONFIG ---
+# SQLite allows a single writer at a time, so the writer "pool" is one connection.
+# Readers never block the writer in WAL mode, so they get their own small pool.
+READER_POOL_SIZE = int(os.getenv("MINDMATE_DB_READERS", "4"))
+ACQUIRE_TIMEOUT = float(os.getenv("MINDMATE_DB_ACQUIRE_TIMEOUT", "10"))
+BUSY_TIMEOUT = 5.0  # seconds sqlite waits on a locked database before raising
+
+# Applied to every pooled connection. journal_mode is persistent in the file,
+# the others are per-connection.
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",    # Safe with WAL, avoids an fsync per commit
+    "PRAGMA cache_size = -16000",     # ~16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",   # 256 MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+)
+
+
 def get_db():
-    """Establishes a connection to the SQLite database."""
+    """Establishes a standalone connection to the SQLite database.
+
+    Kept for scripts and one-off tools. Request handlers should use
+    db_reader() / db_writer() so they share the pooled connections.
+    """
     # 2. Ensure the db/ folder exists
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    
+
     # 3. Connect
     conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    
+
     # 4. Return rows as dictionary-like objects (allows row['column_name'])
-    conn.row_factory = sqlite3.Row 
-    return conn
\ No newline at end of file
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _connect(readonly=False):
+    if readonly:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True,
+                               timeout=BUSY_TIMEOUT, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class ConnectionPool:
+    """A bounded pool of long-lived connections.
+
+    Connections are opened lazily up to `size` and handed out exclusively,
+    so a connection is never used by two threads at the same time.
+    """
+
+    def __init__(self, size, readonly=False):
+        self.size = size
+        self.readonly = readonly
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._all = []
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=ACQUIRE_TIMEOUT):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = _connect(self.readonly)
+                self._all.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            kind = "reader" if self.readonly else "writer"
+            raise sqlite3.OperationalError(f"Timed out waiting for a {kind} connection")
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._all:
+                try: conn.close()
+                except sqlite3.Error: pass
+            self._all.clear()
+            self._idle = queue.LifoQueue(maxsize=self.size)
+
+
+# --- POOLS (one set per worker process) ---
+_pools = None
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def _get_pools():
+    global _pools, _pools_pid
+    # Pools are per-process: a forked worker must not reuse the parent's handles.
+    if _pools is not None and _pools_pid == os.getpid():
+        return _pools
+
+    with _pools_lock:
+        if _pools is None or _pools_pid != os.getpid():
+            os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+            writer = ConnectionPool(1)
+            # Open the writer first: it creates the file and switches it to WAL,
+            # which read-only connections cannot do themselves.
+            writer.release(writer.acquire())
+            _pools = {"writer": writer, "reader": ConnectionPool(READER_POOL_SIZE, readonly=True)}
+            _pools_pid = os.getpid()
+    return _pools
+
+
+@contextmanager
+def db_reader():
+    """Borrow a read-only pooled connection."""
+    pool = _get_pools()["reader"]
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+@contextmanager
+def db_writer():
+    """Borrow the writer connection. Commits on success, rolls back on error."""
+    pool = _get_pools()["writer"]
+    conn = pool.acquire()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
+
+
+def close_pools():
+    """Close every pooled connection (called on app shutdown)."""
+    global _pools
+    with _pools_lock:
+        if _pools is not None and _pools_pid == os.getpid():
+            for pool in _pools.values():
+                pool.close_all()
+        _pools = None
+
+
+# --- TIMESTAMPS ---
+# Every stored timestamp uses this one sortable format in local time, so date
+# filters are plain range scans on the (user_id, start_time / created_at)
+# indexes instead of LIKE or date(). Column defaults in the base schema
+# (services/migrations.py) are datetime('now', 'localtime') for the same
+# reason: CURRENT_TIMESTAMP has this format too, but is UTC.
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+_EXTRA_FORMATS = ("%Y/%m/%d %H:%M", "%d-%m-%Y %H:%M", "%d/%m/%Y %H:%M", "%Y-%m-%d %I:%M %p")
+
+
+def to_db_timestamp(value):
+    """
+    Normalizes a datetime or timestamp string (ISO with 'T', missing seconds,
+    time zone offsets...) to TIMESTAMP_FORMAT. Values that cannot be parsed
+    are returned unchanged rather than dropped.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, date):
+        dt = datetime(value.year, value.month, value.day)
+    else:
+        text = str(value).strip()
+        try:
+            dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            for fmt in _EXTRA_FORMATS:
+                try:
+                    dt = datetime.strptime(text, fmt)
+                    break
+                except ValueError:
+                    continue
+            else:
+                return value
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)   # stored times are local
+    return dt.strftime(TIMESTAMP_FORMAT)
+
+
+def day_range(day):
+    """[start, end) bounds of a calendar day (date or 'YYYY-MM-DD') for range queries."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    start = datetime(day.year, day.month, day.day)
+    return start.strftime(TIMESTAMP_FORMAT), (start + timedelta(days=1)).strftime(TIMESTAMP_FORMAT)
@@ -1,30 +1,72 @@
-import sqlite3, os
-from services.db import get_db
+from services.db import db_reader, to_db_timestamp
+from services.write_queue import write_queue
+from services.context_cache import context_cache
+from services.vectors import vector_index
 
-def log_chat(user_id, sender, text):
-    conn = get_db()
+def _insert_chat(conn, user_id, sender, text):
+    conn.execute("INSERT INTO chat_messages (user_id, sender, text) VALUES (?, ?, ?)", (user_id, sender, text))
+
+def log_chat(user_id, sender, text, durable=False):
+    """Queued (write-behind): returns before the row is committed unless `durable`."""
     try:
-        conn.execute("INSERT INTO messages (user_id, sender, text) VALUES (?, ?, ?)", (user_id, sender, text))
-        conn.commit()
+        write_queue.write(_insert_chat, user_id, sender, text, durable=durable)
     except: pass
-    finally: conn.close()
 
-def save_extracted_data(user_id, data):
+# --- CHAT HISTORY ---
+# Keyset pagination on idx_chat_messages_user_id (user_id, id): every page is
+# an index range scan, however many messages the user has. Ids follow write
+# order; chat merged from the old `messages` table (migration 7) sits below
+# every other id (possibly <= 0) and carries migrations.LEGACY_CHAT_TIMESTAMP.
+def latest_chat_id(user_id):
+    with db_reader() as conn:
+        row = conn.execute("SELECT MAX(id) FROM chat_messages WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] or 0
+
+def get_chat_history(user_id, limit=50, before_id=None, since_id=None):
+    """
+    One page of messages, oldest first.
+    - default: the newest `limit` messages
+    - before_id: the page just older than that id (scrolling up)
+    - since_id: messages newer than that id (incremental sync)
+    Returns (messages, has_more).
+    """
+    cols = "id, sender, text, timestamp"
+    with db_reader() as conn:
+        if since_id is not None:
+            rows = conn.execute(
+                f"SELECT {cols} FROM chat_messages WHERE user_id = ? AND id > ? ORDER BY id ASC LIMIT ?",
+                (user_id, since_id, limit + 1),
+            ).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            rows = conn.execute(
+                f"SELECT {cols} FROM chat_messages WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (user_id, before_id if before_id is not None else 2**63 - 1, limit + 1),
+            ).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit][::-1]
+    return [dict(row) for row in rows], has_more
+
+def _insert_extracted(conn, user_id, data):
     category = data.get("category", "").lower()
-    conn = get_db()
+    cur = conn.cursor()
+    if category == "schedule" or "schedule" in data:
+        s = data.get("schedule", {})
+        cur.execute("INSERT INTO events (user_id, title, start_time, location_name) VALUES (?, ?, ?, ?)",
+                    (user_id, s.get('title'), to_db_timestamp(s.get('start_time')), s.get('location')))
+    elif category == "note" or "note" in data:
+        n = data.get("note", {})
+        cur.execute("INSERT INTO notes (user_id, category, title, summary, original_text) VALUES (?, ?, ?, ?, ?)",
+                    (user_id, n.get('category'), n.get('heading'), n.get('summary'), data.get('raw_text')))
+
+def save_extracted_data(user_id, data):
+    # Durable: shares the next group commit, but only returns once it is on disk
     try:
-        cur = conn.cursor()
-        if category == "schedule" or "schedule" in data:
-            s = data.get("schedule", {})
-            cur.execute("INSERT INTO events (user_id, title, start_time, location_name) VALUES (?, ?, ?, ?)",
-                        (user_id, s.get('title'), s.get('start_time'), s.get('location')))
-        elif category == "note" or "note" in data:
-            n = data.get("note", {})
-            cur.execute("INSERT INTO notes (user_id, category, title, summary, original_text) VALUES (?, ?, ?, ?, ?)",
-                        (user_id, n.get('category'), n.get('heading'), n.get('summary'), data.get('raw_text')))
-        conn.commit()
+        write_queue.write(_insert_extracted, user_id, data, durable=True)
+        context_cache.invalidate(user_id)
+        vector_index.schedule(user_id)   # embed the new row in the background
         return True
     except Exception as e:
         print(f"Error: {e}")
         return False
-    finally: conn.close()
\ No newline at end of file
@@ -10,135 +10,116 @@ def get_db_connection():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     return sqlite3.connect(DB_PATH)
 
+# --- SCHEMA ---
+# Tables, columns and indexes are created by the numbered steps in
+# services/migrations.py (main.py, dummy_data.py and this script all run
+# them). This module keeps the pieces several steps share.
 def init_db():
+    """Creates / upgrades the database and the default 'admin' user."""
+    from services.migrations import migrate
+
     conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # 1. USERS TABLE
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id TEXT PRIMARY KEY,
-            password_hash TEXT NOT NULL,
-            wake_word TEXT DEFAULT 'mindmate',
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    migrate(conn)
 
     # --- 🟢 AUTO-CREATE DEFAULT USER ---
+    cur = conn.cursor()
     cur.execute("SELECT user_id FROM users WHERE user_id = 'admin'")
     if not cur.fetchone():
         cur.execute("INSERT INTO users (user_id, password_hash) VALUES (?, ?)", ('admin', 'admin'))
         print("👤 Default user 'admin' created (Password: admin)")
 
-    # 2. EVENTS TABLE (Calendar / History)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            title TEXT,
-            category TEXT,
-            start_time TEXT,
-            end_time TEXT,
-            location_id INTEGER,
-            location_name TEXT,
-            FOREIGN KEY(user_id) REFERENCES users(user_id)
-        )
-    """)
-
-    # 3. NOTES TABLE (Knowledge / Facts / Summaries)
-    # 🟢 NEW: Dedicated table for storing learned notes with headings & categories
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS notes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            category TEXT,       -- e.g. "Work", "Personal", "Study"
-            title TEXT,          -- The "Heading" generated by AI
-            summary TEXT,        -- The "Summary" of the note
-            original_text TEXT,  -- The raw input for context
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(user_id)
-        )
-    """)
+    conn.commit()
+    conn.close()
+    print("✅ Database initialized successfully.")
 
-    # 4. MEMORIES TABLE (Legacy / Long-term patterns)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS memories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            memory_type TEXT,
-            title TEXT,
-            content TEXT,
-            confidence_score REAL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            last_reinforced DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(user_id)
-        )
-    """)
+# Free-form time columns rewritten to services.db.TIMESTAMP_FORMAT (migrations)
+TIMESTAMP_COLUMNS = {
+    "events": ("start_time", "end_time"),
+    "reminders": ("trigger_time",),
+}
+CANONICAL_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]"
 
-    # 5. CHAT MESSAGES TABLE
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS chat_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            sender TEXT,
-            text TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(user_id)
-        )
-    """)
+def existing_tables(cur):
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    return {row[0] for row in cur.fetchall()}
 
-    # 6. LOCATIONS TABLE
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS locations (
-            location_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            name TEXT
-        )
+def init_updated_at_triggers(cur, table):
+    """Keeps {table}.updated_at current on every insert/update (idempotent)."""
+    now = "datetime('now', 'localtime')"   # same local format as TIMESTAMP_FORMAT
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_touch_insert AFTER INSERT ON {table}
+        WHEN new.updated_at IS NULL BEGIN
+            UPDATE {table} SET updated_at = {now} WHERE id = new.id;
+        END
     """)
-    
-    # 7. REMINDERS TABLE
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS reminders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            event_id INTEGER,
-            message TEXT,
-            trigger_time TEXT,
-            status TEXT DEFAULT 'pending',
-            recurrence_rule TEXT,
-            priority_level TEXT,
-            FOREIGN KEY(event_id) REFERENCES events(id)
-        )
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_touch_update AFTER UPDATE ON {table}
+        WHEN new.updated_at IS old.updated_at BEGIN
+            UPDATE {table} SET updated_at = {now} WHERE id = new.id;
+        END
     """)
 
-    # 8. VOICE ANALYSIS TABLE
+# --- FULL-TEXT SEARCH ---
+# One FTS5 table indexes every searchable record so retrieval is a single
+# MATCH per chat turn. The rowid encodes the source: rowid = id * 4 + kind code,
+# which lets the sync triggers update/delete by rowid instead of scanning.
+# user_id is indexed so a query can filter on it inside the MATCH and only
+# score the caller's records; detail (an event's start_time) is indexed so
+# date keywords such as "2026" or "19" still find events.
+FTS_SOURCES = {
+    # table: (kind code, kind, title, summary, content, detail)
+    "notes":    (1, "note",   "title", "summary", "original_text", "NULL"),
+    "events":   (2, "event",  "title", "NULL",    "location_name", "start_time"),
+    "memories": (3, "memory", "title", "content", "NULL",          "NULL"),
+}
+
+def _fts_values(prefix, code, kind, title, summary, content, detail):
+    cols = [f"{prefix}.{c}" if c != "NULL" else "NULL" for c in (title, summary, content, detail)]
+    return f"{prefix}.id * 4 + {code}, '{kind}', {prefix}.user_id, " + ", ".join(cols)
+
+def init_search_index(cur):
+    """Creates the knowledge_fts index and its sync triggers (idempotent)."""
+    existing = existing_tables(cur)
+    is_new = "knowledge_fts" not in existing
+
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS voice_analysis (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            associated_event_id INTEGER,
-            original_transcript TEXT,
-            emotion_label TEXT,
-            stress_level REAL,
-            FOREIGN KEY(associated_event_id) REFERENCES events(id)
+        CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5(
+            kind UNINDEXED,
+            user_id,
+            title,
+            summary,
+            content,
+            detail,
+            tokenize = 'porter unicode61'
         )
     """)
 
-    # --- MIGRATION CHECK (For existing DBs) ---
-    # Attempt to add columns if they are missing in older DB versions
-    try:
-        cur.execute("ALTER TABLE events ADD COLUMN location_name TEXT")
-        print("✅ Added 'location_name' column to events.")
-    except sqlite3.OperationalError: pass 
-
-    try:
-        cur.execute("ALTER TABLE memories ADD COLUMN title TEXT")
-        print("✅ Added 'title' column to memories.")
-    except sqlite3.OperationalError: pass
-
-    conn.commit()
-    conn.close()
-    print("✅ Database initialized successfully (with 'notes' table).")
+    insert_cols = "INSERT INTO knowledge_fts (rowid, kind, user_id, title, summary, content, detail)"
+    for table, spec in FTS_SOURCES.items():
+        if table not in existing:
+            continue
+        code = spec[0]
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                {insert_cols} VALUES ({_fts_values("new", *spec)});
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM knowledge_fts WHERE rowid = old.id * 4 + {code};
+            END
+        """)
+        # Only when an indexed column changes: not for updated_at touches
+        watched = ", ".join(["user_id"] + [c for c in spec[2:] if c != "NULL"])
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {watched} ON {table} BEGIN
+                DELETE FROM knowledge_fts WHERE rowid = old.id * 4 + {code};
+                {insert_cols} VALUES ({_fts_values("new", *spec)});
+            END
+        """)
+        # Backfill rows written before the index existed
+        if is_new:
+            cur.execute(f"{insert_cols} SELECT {_fts_values(table, *spec)} FROM {table}")
 
 if __name__ == "__main__":
     init_db()
\ No newline at end of file
@@ -0,0 +1,37 @@
+# services/metrics.py
+import threading
+from collections import defaultdict
+
+class Metrics:
+    """In-process counters and timings, exposed by the /metrics endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._timings = {}
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, seconds: float):
+        """Records one duration sample (count / total / max per name)."""
+        with self._lock:
+            t = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            t["count"] += 1
+            t["total"] += seconds
+            t["max"] = max(t["max"], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            timings = {
+                name: {
+                    "count": t["count"],
+                    "avg_ms": round(t["total"] / t["count"] * 1000, 2),
+                    "max_ms": round(t["max"] * 1000, 2),
+                }
+                for name, t in self._timings.items()
+            }
+            return {"counters": dict(self._counters), "timings": timings}
+
+metrics = Metrics()
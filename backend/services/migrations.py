@@ -0,0 +1,394 @@
+# services/migrations.py
+import os
+from datetime import datetime
+from services.db import to_db_timestamp
+from services.init_db import (
+    CANONICAL_GLOB, FTS_SOURCES, TIMESTAMP_COLUMNS,
+    existing_tables, init_search_index, init_updated_at_triggers,
+)
+
+# Rows per transaction in online backfills. Each chunk commits on its own, so
+# request handlers waiting on the writer are only blocked for one chunk.
+BACKFILL_BATCH_SIZE = int(os.getenv("MINDMATE_BACKFILL_BATCH", "500"))
+
+# --- HELPERS ---
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def add_columns(conn, tables):
+    """Adds each {table: {column: decl}} column that is missing (idempotent)."""
+    for table, columns in tables.items():
+        existing = _columns(conn, table)
+        for column, decl in columns.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+                print(f"✅ Added '{column}' column to {table}.")
+
+def create_indexes(conn, indexes):
+    """Creates each {name: (table, columns)} index whose table exists (idempotent)."""
+    existing = existing_tables(conn.cursor())
+    for name, (table, columns) in indexes.items():
+        if table in existing:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+def backfill(conn, select_sql, update_sql, transform, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Keyset-walks a table in chunks and commits after each one.
+
+    `select_sql` takes (last_id, limit) and must return rows whose first
+    column is the id, ordered by it. `transform(row)` returns the parameters
+    for `update_sql`, or None to leave the row alone. Safe to re-run.
+    """
+    last_id, updated = 0, 0
+    while True:
+        rows = conn.execute(select_sql, (last_id, batch_size)).fetchall()
+        if not rows:
+            return updated
+        last_id = rows[-1][0]
+        params = [p for p in map(transform, rows) if p is not None]
+        if params:
+            conn.executemany(update_sql, params)
+            updated += len(params)
+        conn.commit()
+
+# --- STEPS ---
+# Each step is idempotent: a crash half-way (or two workers starting at
+# once) just re-runs it.
+
+# Schema created by migration 1. These literals (and those of steps 2 and 6)
+# belong to their steps: once a release has run a step, later schema changes
+# go in new steps, so fresh and upgraded databases run the same statements.
+BASE_TABLES = {
+    # 1. USERS TABLE
+    "users": """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            password_hash TEXT NOT NULL,
+            wake_word TEXT DEFAULT 'mindmate',
+            created_at DATETIME DEFAULT (datetime('now', 'localtime'))
+        )
+    """,
+    # 2. EVENTS TABLE (Calendar / History)
+    "events": """
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            title TEXT,
+            category TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            location_id INTEGER,
+            location_name TEXT,
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+    """,
+    # 3. NOTES TABLE (Knowledge / Facts / Summaries)
+    "notes": """
+        CREATE TABLE IF NOT EXISTS notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            category TEXT,       -- e.g. "Work", "Personal", "Study"
+            title TEXT,          -- The "Heading" generated by AI
+            summary TEXT,        -- The "Summary" of the note
+            original_text TEXT,  -- The raw input for context
+            created_at DATETIME DEFAULT (datetime('now', 'localtime')),
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+    """,
+    # 4. MEMORIES TABLE (Legacy / Long-term patterns)
+    "memories": """
+        CREATE TABLE IF NOT EXISTS memories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            memory_type TEXT,
+            title TEXT,
+            content TEXT,
+            confidence_score REAL,
+            created_at DATETIME DEFAULT (datetime('now', 'localtime')),
+            last_reinforced DATETIME DEFAULT (datetime('now', 'localtime')),
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+    """,
+    # 5. CHAT MESSAGES TABLE
+    "chat_messages": """
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            sender TEXT,
+            text TEXT,
+            timestamp DATETIME DEFAULT (datetime('now', 'localtime')),
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+    """,
+    # 6. LOCATIONS TABLE
+    "locations": """
+        CREATE TABLE IF NOT EXISTS locations (
+            location_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            name TEXT
+        )
+    """,
+    # 7. REMINDERS TABLE
+    "reminders": """
+        CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            event_id INTEGER,
+            message TEXT,
+            trigger_time TEXT,
+            status TEXT DEFAULT 'pending',
+            recurrence_rule TEXT,
+            priority_level TEXT,
+            FOREIGN KEY(event_id) REFERENCES events(id)
+        )
+    """,
+    # 8. VOICE ANALYSIS TABLE
+    "voice_analysis": """
+        CREATE TABLE IF NOT EXISTS voice_analysis (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            associated_event_id INTEGER,
+            original_transcript TEXT,
+            emotion_label TEXT,
+            stress_level REAL,
+            FOREIGN KEY(associated_event_id) REFERENCES events(id)
+        )
+    """,
+    # 9. TIMELINE TABLE (/memories feed, seeded by dummy_data.py)
+    "timeline": """
+        CREATE TABLE IF NOT EXISTS timeline (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            type TEXT,
+            title TEXT,
+            content TEXT,
+            category TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            is_completed BOOLEAN DEFAULT 0
+        )
+    """,
+    # 10. LEGACY MESSAGES TABLE (chat log written by db_helper.log_chat)
+    "messages": """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY,
+            user_id TEXT,
+            sender TEXT,
+            text TEXT
+        )
+    """,
+}
+
+# Migration 2: columns added after the first release. Databases created by
+# older code (main.py used to create users with only a 'password' column) get
+# them here instead of through try/except ALTER TABLE.
+ADDED_COLUMNS = {
+    "users": {"password_hash": "TEXT", "wake_word": "TEXT DEFAULT 'mindmate'", "created_at": "DATETIME"},
+    "events": {"category": "TEXT", "end_time": "TEXT", "location_id": "INTEGER", "location_name": "TEXT"},
+    "memories": {"title": "TEXT"},
+    "timeline": {"end_time": "TEXT", "is_completed": "BOOLEAN DEFAULT 0"},
+}
+
+def create_base_tables(conn):
+    for ddl in BASE_TABLES.values():
+        conn.execute(ddl)
+
+def add_missing_columns(conn):
+    add_columns(conn, ADDED_COLUMNS)
+
+def copy_legacy_passwords(conn):
+    # main.py and dummy_data.py used to create users(user_id, password)
+    if "password" not in _columns(conn, "users"):
+        return
+    n = backfill(
+        conn,
+        "SELECT rowid, password FROM users WHERE rowid > ? AND password_hash IS NULL ORDER BY rowid LIMIT ?",
+        "UPDATE users SET password_hash = ? WHERE rowid = ?",
+        lambda row: (row[1], row[0]),
+    )
+    if n:
+        print(f"🔑 Copied {n} legacy passwords to password_hash.")
+
+def build_search_index(conn):
+    init_search_index(conn.cursor())
+
+def normalize_timestamps(conn):
+    """Rewrites free-form times to TIMESTAMP_FORMAT; unparseable values are left alone."""
+    def fix(row):
+        value = to_db_timestamp(row[1])
+        return (value, row[0]) if value != row[1] else None
+
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        for column in columns:
+            n = backfill(
+                conn,
+                f"""SELECT id, {column} FROM {table}
+                    WHERE id > ? AND {column} IS NOT NULL AND {column} NOT GLOB '{CANONICAL_GLOB}'
+                    ORDER BY id LIMIT ?""",
+                f"UPDATE {table} SET {column} = ? WHERE id = ?",
+                fix,
+            )
+            if n:
+                print(f"🕒 Normalized {n} timestamps in {table}.{column}")
+
+# Migration 6. Per-user lookups are always "this user's rows in a time/id
+# range", so each table gets a composite index that serves them as a range scan.
+PER_USER_INDEXES = {
+    # index name: (table, columns)
+    "idx_events_user_start":      ("events", "user_id, start_time"),
+    "idx_notes_user_created":     ("notes", "user_id, created_at"),
+    "idx_memories_user_created":  ("memories", "user_id, created_at"),
+    "idx_chat_messages_user_id":  ("chat_messages", "user_id, id"),
+    "idx_messages_user_id":       ("messages", "user_id, id"),
+    "idx_reminders_user_trigger": ("reminders", "user_id, trigger_time"),
+}
+
+def create_per_user_indexes(conn):
+    create_indexes(conn, PER_USER_INDEXES)
+
+# `messages` never had a time column, so merged rows get this fixed, obviously
+# fake time instead of NULL (it also sorts before every real timestamp).
+LEGACY_CHAT_TIMESTAMP = "1970-01-01 00:00:00"
+
+def merge_legacy_messages(conn, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Moves the old `messages` chat log into chat_messages, then drops it.
+
+    The legacy log predates chat_messages, so its rows get ids just below
+    the lowest existing one (zero or negative if needed), in their original
+    order: /chat/history pages by id and shows them as the oldest messages.
+    Existing ids never change, so clients' before_id/since_id stay valid.
+    """
+    moved = 0
+    while True:
+        # Copy + delete per chunk in one transaction: a re-run never duplicates.
+        # Newest legacy chunk first, each one placed just below the current floor.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages'").fetchone():
+                conn.rollback()
+                break
+            low, high = conn.execute(
+                "SELECT MIN(id), MAX(id) FROM (SELECT id FROM messages ORDER BY id DESC LIMIT ?)", (batch_size,)
+            ).fetchone()
+            if low is None:
+                conn.execute("DROP TABLE messages")
+                conn.commit()
+                break
+            floor = conn.execute("SELECT COALESCE(MIN(id), 1) FROM chat_messages").fetchone()[0]
+            conn.execute("""
+                INSERT INTO chat_messages (id, user_id, sender, text, timestamp)
+                SELECT ? - 1 - (? - id), user_id, sender, text, ? FROM messages WHERE id BETWEEN ? AND ?
+            """, (floor, high, LEGACY_CHAT_TIMESTAMP, low, high))
+            moved += conn.execute("DELETE FROM messages WHERE id BETWEEN ? AND ?", (low, high)).rowcount
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    if moved:
+        print(f"💬 Moved {moved} messages into chat_messages.")
+
+def prepare_timeline_sync(conn):
+    # updated_at is set by triggers and drives /memories?since=
+    add_columns(conn, {"timeline": {"updated_at": "TEXT"}})
+    init_updated_at_triggers(conn.cursor(), "timeline")
+    create_indexes(conn, {
+        "idx_timeline_user_id":      ("timeline", "user_id, id"),
+        "idx_timeline_user_updated": ("timeline", "user_id, updated_at"),
+    })
+
+def backfill_timeline_updated_at(conn):
+    # Existing rows count as changed at migration time. Not start_time:
+    # future events would then match every ?since= until they happened.
+    now = to_db_timestamp(datetime.now())
+    backfill(
+        conn,
+        "SELECT id FROM timeline WHERE id > ? AND updated_at IS NULL ORDER BY id LIMIT ?",
+        "UPDATE timeline SET updated_at = ? WHERE id = ?",
+        lambda row: (now, row[0]),
+    )
+
+def prepare_knowledge_sync(conn):
+    # updated_at on every searchable table lets services/vectors.py re-embed edited rows
+    add_columns(conn, {table: {"updated_at": "TEXT"} for table in FTS_SOURCES})
+    for table in FTS_SOURCES:
+        # The touch trigger updates the row it fires on; an fts_update trigger
+        # still firing on every UPDATE would re-index it mid-INSERT (duplicate rowid).
+        conn.execute(f"DROP TRIGGER IF EXISTS {table}_fts_update")
+        init_updated_at_triggers(conn.cursor(), table)
+    init_search_index(conn.cursor())
+    create_indexes(conn, {
+        f"idx_{table}_user_updated": (table, "user_id, updated_at, id") for table in FTS_SOURCES
+    })
+
+def backfill_knowledge_updated_at(conn):
+    now = to_db_timestamp(datetime.now())
+    for table in FTS_SOURCES:
+        backfill(
+            conn,
+            f"SELECT id FROM {table} WHERE id > ? AND updated_at IS NULL ORDER BY id LIMIT ?",
+            f"UPDATE {table} SET updated_at = ? WHERE id = ?",
+            lambda row: (now, row[0]),
+        )
+
+# (version, name, step, online). Append only: never renumber or edit a step
+# that has shipped, add a new one instead. Online steps commit in batches
+# and run outside the version transaction.
+MIGRATIONS = [
+    (1, "base tables", create_base_tables, False),
+    (2, "add missing columns", add_missing_columns, False),
+    (3, "copy legacy passwords", copy_legacy_passwords, True),
+    (4, "full-text search index", build_search_index, False),
+    (5, "canonical timestamps", normalize_timestamps, True),
+    (6, "per-user indexes", create_per_user_indexes, False),
+    (7, "merge messages into chat_messages", merge_legacy_messages, True),
+    (8, "timeline sync columns", prepare_timeline_sync, False),
+    (9, "backfill timeline updated_at", backfill_timeline_updated_at, True),
+    (10, "knowledge sync columns", prepare_knowledge_sync, False),
+    (11, "backfill knowledge updated_at", backfill_knowledge_updated_at, True),
+]
+
+# --- RUNNER ---
+def current_version(conn):
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def migrate(conn):
+    """Applies every pending migration in order. Returns the schema version."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at TEXT
+        )
+    """)
+    conn.commit()
+
+    for version, name, step, online in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+
+        if online:
+            step(conn)
+            conn.commit()
+
+        # IMMEDIATE takes the write lock up front, so a second worker waits
+        # here and then sees the step as done.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            if not online:
+                step(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, to_db_timestamp(datetime.now())),
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        print(f"🧱 Migration {version} applied: {name}")
+
+    return current_version(conn)
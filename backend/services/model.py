@@ -1,7 +1,7 @@
 import joblib
 import os
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # 🟢 FIX: Look in sibling folder 'models'
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__)) # backend/services/
@@ -30,9 +30,7 @@ class MindMateModel:
         except Exception as e:
             print(f"❌ Error loading ML model: {e}")
 
-    def predict_single(self, hour, day_of_week, prev_activity, location="Home", fatigue="Low"):
-        if not self.model: return "Rest"
-
+    def _encode(self, hour, day_of_week, prev_activity, location="Home", fatigue="Low"):
         hour_sin = np.sin(2 * np.pi * hour / 24)
         hour_cos = np.cos(2 * np.pi * hour / 24)
         
@@ -40,42 +38,80 @@ class MindMateModel:
         loc_code = self.location_map.get(location, 0)
         fat_code = self.fatigue_map.get(fatigue, 0)
 
-        X_input = [[hour_sin, hour_cos, day_of_week, prev_code, loc_code, fat_code]]
-        
+        return [hour_sin, hour_cos, day_of_week, prev_code, loc_code, fat_code]
+
+    def predict_batch(self, X):
+        """Predicts activity names for an (n, 6) feature matrix in one model call."""
+        X = np.asarray(X, dtype=float)
+        if not self.model or len(X) == 0: return ["Rest"] * len(X)
         try:
-            pred_idx = self.model.predict(X_input)[0]
-            return self.reverse_activity_map.get(pred_idx, "Rest")
+            return [self.reverse_activity_map.get(int(i), "Rest") for i in self.model.predict(X)]
         except:
-            return "Rest"
+            return ["Rest"] * len(X)
+
+    def predict_single(self, hour, day_of_week, prev_activity, location="Home", fatigue="Low"):
+        if not self.model: return "Rest"
+        return self.predict_batch([self._encode(hour, day_of_week, prev_activity, location, fatigue)])[0]
+
+    @staticmethod
+    def _slot_context(hour, current_activity):
+        location = "Home"
+        if current_activity in ["Work", "Study"]: location = "Office"
+        if current_activity == "Gym": location = "Gym"
+        
+        fatigue = "Low"
+        if hour > 18: fatigue = "Medium"
+        if hour > 21: fatigue = "High"
+        return location, fatigue
+
+    def suggest_schedules(self, target_dates, hours=range(7, 24)):
+        """
+        Simulates the day for several dates at once.
+        Location and fatigue only depend on (hour, previous activity), so every
+        possible transition for every weekday involved is predicted in ONE model
+        call, and the hour-by-hour chain is then walked through that table.
+        """
+        hours = list(hours)
+        activities = list(self.activity_map)
+        weekdays = sorted({d.weekday() for d in target_dates})
+
+        keys, rows = [], []
+        for dow in weekdays:
+            for hour in hours:
+                for prev in activities:
+                    keys.append((dow, hour, prev))
+                    rows.append(self._encode(hour, dow, prev, *self._slot_context(hour, prev)))
+        table = dict(zip(keys, self.predict_batch(rows)))
+
+        schedules = {}
+        for target_date in target_dates:
+            day_of_week = target_date.weekday()
+            schedule = []
+            current_activity = "Sleep" 
+            for hour in hours:
+                location, _ = self._slot_context(hour, current_activity)
+                next_activity = table.get((day_of_week, hour, current_activity), "Rest")
+                schedule.append({
+                    "time": f"{hour:02d}:00",
+                    "activity": next_activity,
+                    "location": location
+                })
+                current_activity = next_activity
+            schedules[target_date.strftime("%Y-%m-%d")] = schedule
+        return schedules
 
     def suggest_daily_schedule(self, target_date_str):
-        # ... (Keep existing simulation logic) ...
-        # (This part doesn't need path changes)AC
         try:
             target_date = datetime.strptime(target_date_str, "%Y-%m-%d")
         except ValueError:
             target_date = datetime.now()
 
-        day_of_week = target_date.weekday()
-        schedule = []
-        current_activity = "Sleep" 
-        
-        for hour in range(7, 24):
-            location = "Home"
-            if current_activity in ["Work", "Study"]: location = "Office"
-            if current_activity == "Gym": location = "Gym"
-            
-            fatigue = "Low"
-            if hour > 18: fatigue = "Medium"
-            if hour > 21: fatigue = "High"
+        return self.suggest_schedules([target_date])[target_date.strftime("%Y-%m-%d")]
 
-            next_activity = self.predict_single(hour, day_of_week, current_activity, location, fatigue)
-            
-            schedule.append({
-                "time": f"{hour:02d}:00",
-                "activity": next_activity,
-                "location": location
-            })
-            current_activity = next_activity
-            
-        return schedule
\ No newline at end of file
+    def suggest_week_schedule(self, start_date_str, days=7):
+        """Week-ahead schedules (date -> schedule) from a single model call."""
+        try:
+            start = datetime.strptime(start_date_str, "%Y-%m-%d")
+        except ValueError:
+            start = datetime.now()
+        return self.suggest_schedules([start + timedelta(days=i) for i in range(days)])
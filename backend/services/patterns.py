@@ -1,20 +1,17 @@
-from services.db import get_db
+from services.db import db_reader
 from collections import Counter
 
 def daily_overview(user_id: str):
     """Calculates the dominant activity for morning, afternoon, and evening."""
-    conn = get_db()
-    cur = conn.cursor()
-
     # Query events (assuming you have historical data here)
-    cur.execute("""
-        SELECT start_time, title 
-        FROM events 
-        WHERE user_id = ?
-    """, (user_id,))
-    
-    rows = cur.fetchall()
-    conn.close()
+    with db_reader() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT start_time, title 
+            FROM events 
+            WHERE user_id = ?
+        """, (user_id,))
+        rows = cur.fetchall()
 
     buckets = {"morning": [], "afternoon": [], "evening": [], "night": []}
 
@@ -0,0 +1,85 @@
+# services/registry.py
+import threading
+import time
+
+class ModelRegistry:
+    """
+    Loads heavy models (Whisper, SpeechBrain, habit model) on first use
+    instead of at import time, so a worker can serve /auth/login or
+    /dashboard before any model is in memory.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._probes = {}
+        self._models = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader, probe=None):
+        """
+        `loader()` builds and returns the model. `probe()` is optional, for
+        components that manage their own lazy state: it reports whether they
+        are loaded even when they were not loaded through the registry.
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+            if probe is not None:
+                self._probes[name] = probe
+
+    def get(self, name):
+        try:
+            return self._models[name]
+        except KeyError:
+            pass
+
+        # One lock per model: loading Whisper does not block a SpeechBrain load
+        with self._locks[name]:
+            if name in self._models:
+                return self._models[name]
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                self._errors[name] = str(e)
+                raise
+            self._load_seconds[name] = round(time.perf_counter() - start, 2)
+            self._errors.pop(name, None)
+            self._models[name] = model
+            return model
+
+    def is_loaded(self, name):
+        if name in self._models:
+            return True
+        probe = self._probes.get(name)
+        return bool(probe and probe())
+
+    def status(self):
+        return {
+            name: {
+                "loaded": self.is_loaded(name),
+                "load_seconds": self._load_seconds.get(name),
+                "error": self._errors.get(name),
+            }
+            for name in list(self._loaders)
+        }
+
+    def warm_up(self, names=None):
+        """Loads the given (default: all) models in a background thread."""
+        names = list(names or self._loaders)
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"⚠️ Warm-up failed for '{name}': {e}")
+
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+registry = ModelRegistry()
@@ -0,0 +1,331 @@
+# services/vectors.py
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from app.llm import ollama, EMBED_MODEL
+from services.db import db_reader
+from services.init_db import FTS_SOURCES
+from services.metrics import metrics
+
+# --- CONFIG ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VECTOR_DIR = os.path.join(BASE_DIR, "db", "vectors")
+EMBED_BATCH = 32                  # texts per /api/embed call
+EMBED_TIMEOUT = 5.0               # seconds
+EMBED_RETRY_AFTER = 30.0          # after a failure, skip semantic search this long
+MIN_SIMILARITY = 0.3              # cosine floor for a semantic hit
+# float32 copies of hot users' matrices; 100k x 384 is ~150 MB
+HOT_CACHE_BYTES = int(os.getenv("MINDMATE_VECTOR_CACHE_MB", "512")) * 1024 * 1024
+
+def _normalize(vectors):
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9)
+
+def _text_hash(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+def _source_text(spec):
+    # title / summary / content columns of FTS_SOURCES, as one SQL expression
+    cols = [c for c in spec[2:5] if c != "NULL"]
+    return " || ' ' || ".join(f"COALESCE({c}, '')" for c in cols)
+
+class UserVectors:
+    """
+    One user's embeddings on disk: `vectors.f16` is a raw float16 (count, dim)
+    matrix read through np.memmap, `ids.i64` the matching knowledge_fts rowids,
+    and `meta.json` the count, model and per-table high-water marks. Both data
+    files are append-only; meta.json is replaced atomically and its count is
+    what readers trust. An edited row is appended again, and load() keeps
+    only the latest vector per rowid.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.meta, self.stale = self._read_meta()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self):
+        """(meta, stale). A store embedded with another model reads as empty and stale."""
+        empty = {"model": EMBED_MODEL, "dim": 0, "count": 0, "marks": {}}
+        try:
+            with open(self._path("meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return empty, False
+        if meta.get("model") != EMBED_MODEL or "marks" not in meta:
+            return empty, True      # "marks" missing: written before edits were tracked
+        return meta, False
+
+    def reset(self):
+        """Deletes a stale store. Only the indexer thread writes stores, so only it may call this."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.meta, self.stale = self._read_meta()
+
+    @property
+    def count(self):
+        return self.meta["count"]
+
+    def _append_raw(self, name, data: np.ndarray, keep_bytes):
+        path = self._path(name)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.truncate(keep_bytes)      # drop any tail a crash left behind
+            f.seek(0, os.SEEK_END)
+            f.write(data.tobytes())
+
+    def append(self, ids, vectors, marks):
+        os.makedirs(self.directory, exist_ok=True)
+        count = self.count
+        if len(ids):
+            dim = vectors.shape[1]
+            self._append_raw("vectors.f16", vectors.astype(np.float16), count * dim * 2)
+            self._append_raw("ids.i64", np.asarray(ids, dtype=np.int64), count * 8)
+            self.meta["dim"] = dim
+            self.meta["count"] = count + len(ids)
+        self.meta["marks"] = marks
+
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    def load(self):
+        """(ids, float32 matrix) for search; converted from the memmap in chunks."""
+        count, dim = self.count, self.meta["dim"]
+        if count == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, dim), dtype=np.float32)
+        ids = np.fromfile(self._path("ids.i64"), dtype=np.int64, count=count)
+        stored = np.memmap(self._path("vectors.f16"), dtype=np.float16, mode="r", shape=(count, dim))
+        matrix = np.empty((count, dim), dtype=np.float32)
+        for start in range(0, count, 16384):
+            matrix[start:start + 16384] = stored[start:start + 16384]
+        del stored
+        latest = self._latest(ids)
+        if len(latest) < count:
+            ids, matrix = ids[latest], matrix[latest]
+        return ids, matrix
+
+    @staticmethod
+    def _latest(ids):
+        """Positions of the last vector appended for each rowid, in append order."""
+        _, first_from_end = np.unique(ids[::-1], return_index=True)
+        return np.sort(len(ids) - 1 - first_from_end)
+
+    def live_count(self):
+        if self.count == 0:
+            return 0
+        return len(np.unique(np.fromfile(self._path("ids.i64"), dtype=np.int64, count=self.count)))
+
+class VectorIndex:
+    """
+    Semantic retrieval over each user's notes, events and memories.
+
+    Write paths call schedule(user_id); a background thread then embeds the
+    user's new and edited rows (by updated_at) in batches and appends them
+    to their UserVectors. The chat turn embeds its query with embed_query()
+    on the event loop, and search() runs an exact top-k cosine over the
+    user's float32 matrix (one GEMV, a few ms at 100k rows), returning
+    knowledge_fts rowids so results join back to the keyword index.
+    """
+
+    def __init__(self, root=VECTOR_DIR):
+        self.root = root
+        self._hot = OrderedDict()          # user_id -> (ids, matrix)
+        self._hot_bytes = 0
+        self._synced = set()               # users synced at least once by this process
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+        self._down_until = 0.0
+
+    # --- EMBEDDINGS ---
+    @property
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def _embed_failed(self):
+        metrics.incr("vectors.embed_errors")
+        self._down_until = time.monotonic() + EMBED_RETRY_AFTER
+
+    def embed(self, texts):
+        """Unit-length float32 embeddings for `texts` (one Ollama call per batch). Blocking."""
+        try:
+            out = []
+            for start in range(0, len(texts), EMBED_BATCH):
+                out.extend(ollama.embed_blocking(texts[start:start + EMBED_BATCH], timeout=EMBED_TIMEOUT))
+            return _normalize(np.asarray(out, dtype=np.float32))
+        except Exception:
+            self._embed_failed()
+            raise
+
+    async def embed_query(self, text):
+        """The query vector for search(), or None if semantic search is unavailable."""
+        if not text.strip() or not self.available:
+            return None
+        try:
+            vector = await ollama.embed([text], timeout=EMBED_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._embed_failed()
+            return None
+        return _normalize(np.asarray(vector, dtype=np.float32))[0]
+
+    # --- STORAGE ---
+    def _user_dir(self, user_id):
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)[:40]
+        return os.path.join(self.root, f"{safe}-{hashlib.sha1(user_id.encode()).hexdigest()[:8]}")
+
+    def _hot_get(self, user_id):
+        with self._lock:
+            entry = self._hot.get(user_id)
+            if entry is not None:
+                self._hot.move_to_end(user_id)
+            return entry
+
+    def _hot_put(self, user_id, entry):
+        with self._lock:
+            old = self._hot.pop(user_id, None)
+            if old is not None:
+                self._hot_bytes -= old[1].nbytes
+            self._hot[user_id] = entry
+            self._hot_bytes += entry[1].nbytes
+            while self._hot_bytes > HOT_CACHE_BYTES and len(self._hot) > 1:
+                _, (_, evicted) = self._hot.popitem(last=False)
+                self._hot_bytes -= evicted.nbytes
+
+    # --- INDEXING ---
+    def schedule(self, user_id):
+        """Queues an incremental sync for the user (call after their writes commit)."""
+        with self._cond:
+            if self._stopped:
+                return
+            self._pending[user_id] = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="vector-indexer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                user_id, _ = self._pending.popitem(last=False)
+            try:
+                self.sync_user(user_id)
+            except Exception as e:
+                print(f"⚠️ Vector sync failed for '{user_id}': {e}")
+
+    def sync_user(self, user_id):
+        """Embeds rows added or edited since the last sync and appends them to the user's store."""
+        if not self.available:
+            return
+        store = UserVectors(self._user_dir(user_id))
+        if store.stale:
+            store.reset()       # different model: re-embed everything
+        marks = dict(store.meta["marks"])
+        added = 0
+
+        for table, spec in FTS_SOURCES.items():
+            code = spec[0]
+            # The mark is the newest updated_at embedded plus a hash of each row
+            # embedded at that second. updated_at has 1 s resolution, so rows at
+            # the mark are read again and skipped only if their text is unchanged.
+            mark = marks.get(table, {"updated_at": "", "rows": {}})
+            after = (mark["updated_at"], 0)
+            while True:
+                with db_reader() as conn:
+                    rows = conn.execute(
+                        f"""SELECT id, updated_at, {_source_text(spec)} FROM {table}
+                            WHERE user_id = ? AND (updated_at, id) > (?, ?)
+                            ORDER BY updated_at, id LIMIT ?""",
+                        (user_id, *after, EMBED_BATCH * 4),
+                    ).fetchall()
+                if not rows:
+                    break
+                after = tuple(rows[-1][:2])
+                todo, moved = [], False
+                for row_id, updated_at, text in rows:
+                    text, digest = text.strip(), _text_hash(text.strip())
+                    if updated_at == mark["updated_at"] and mark["rows"].get(str(row_id)) == digest:
+                        continue
+                    if updated_at != mark["updated_at"]:
+                        mark = {"updated_at": updated_at, "rows": {}}
+                    mark["rows"][str(row_id)] = digest
+                    moved = True
+                    if text:
+                        todo.append((row_id * 4 + code, text))
+                if not moved:
+                    continue
+                vectors = self.embed([t for _, t in todo]) if todo else None
+                marks[table] = mark
+                store.append([rowid for rowid, _ in todo], vectors, marks)
+                added += len(todo)
+
+        with self._lock:
+            self._synced.add(user_id)
+        if not added:
+            return
+        metrics.incr("vectors.embedded", added)
+        # Each edit appends a vector. Once most of the store is superseded,
+        # start over: amortized, every edit costs one more embedding.
+        if store.count > 2 * max(store.live_count(), EMBED_BATCH * 4):
+            store.reset()
+            self.schedule(user_id)
+        if self._hot_get(user_id) is not None:
+            self._hot_put(user_id, store.load())   # swap in the new matrix
+
+    # --- SEARCH ---
+    def search(self, user_id, query, k):
+        """
+        knowledge_fts rowids of the k records most similar to `query` (a vector
+        from embed_query), best first. [] if there is no query vector.
+        """
+        with self._lock:
+            synced = user_id in self._synced
+        if not synced:
+            self.schedule(user_id)    # first query this process: catch up in the background
+        if query is None:
+            return []
+
+        entry = self._hot_get(user_id)
+        if entry is None:
+            # Read-only here: a stale store counts as empty until the indexer resets it
+            store = UserVectors(self._user_dir(user_id))
+            if store.count == 0:
+                return []
+            try:
+                entry = store.load()
+            except (OSError, ValueError):
+                return []     # the indexer is resetting this store
+            self._hot_put(user_id, entry)
+        ids, matrix = entry
+        if not len(ids) or matrix.shape[1] != len(query):
+            return []
+
+        started = time.perf_counter()
+        scores = matrix @ query
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        metrics.observe("vectors.search", time.perf_counter() - started)
+        return [int(ids[i]) for i in best if scores[i] >= MIN_SIMILARITY]
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+vector_index = VectorIndex()
@@ -1,89 +1,283 @@
 import os
-import shutil
-import torch
-import torchaudio
+import threading
+from collections import OrderedDict
 import soundfile as sf
 import numpy as np
-
-# --- 🛠️ CRITICAL FIX: APPLY PATCH FIRST! ---
-# We MUST define this BEFORE importing speechbrain.
-# SpeechBrain checks torchaudio immediately upon loading.
-if not hasattr(torchaudio, "list_audio_backends"):
-    torchaudio.list_audio_backends = lambda: ["soundfile"]
-# -------------------------------------------
-
-# NOW it is safe to import SpeechBrain
-from speechbrain.inference.speaker import SpeakerRecognition
+from services.registry import registry
+from services.batcher import MicroBatcher
+from services.metrics import metrics
+from services.audio import decode_audio, TARGET_RATE
 
 # --- CONFIG ---
 VOICE_DB_DIR = "voice_signatures"
 MODEL_SOURCE = "speechbrain/spkrec-ecapa-voxceleb"
 SAVED_MODEL_DIR = "voice_auth_model"
+MATCH_THRESHOLD = 0.25        # Same cosine threshold SpeechBrain's verify_batch uses
+EMBEDDING_CACHE_SIZE = 256    # Hot reference embeddings kept in memory
+IDENTIFY_TOP_K = 3            # Candidates returned by "who is speaking"
+# Concurrent embedding requests are collected this long and run as one batch
+BATCH_MAX_SIZE = int(os.getenv("MINDMATE_VOICE_BATCH_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("MINDMATE_VOICE_BATCH_WAIT_MS", "8"))
+# Seconds a caller waits for its embedding (the first one may load the model)
+EMBED_TIMEOUT = 60.0
 
 os.makedirs(VOICE_DB_DIR, exist_ok=True)
 
+def _load_speaker_model():
+    # torch / speechbrain are imported here, not at module import, so the API
+    # can start serving before the voice model is needed.
+    import torch
+    import torchaudio
+
+    # --- 🛠️ CRITICAL FIX: APPLY PATCH FIRST! ---
+    # We MUST define this BEFORE importing speechbrain.
+    # SpeechBrain checks torchaudio immediately upon loading.
+    if not hasattr(torchaudio, "list_audio_backends"):
+        torchaudio.list_audio_backends = lambda: ["soundfile"]
+    # -------------------------------------------
+
+    # NOW it is safe to import SpeechBrain
+    from speechbrain.inference.speaker import SpeakerRecognition
+
+    print("🔒 Loading Voice Security Model (SpeechBrain)...")
+    # Detect GPU or CPU
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    run_opts = {"device": device}
+    
+    model = SpeakerRecognition.from_hparams(
+        source=MODEL_SOURCE, 
+        savedir=SAVED_MODEL_DIR, 
+        run_opts=run_opts
+    )
+    print("✅ Voice Security Model Loaded.")
+    return model
+
+registry.register("speaker", _load_speaker_model)
+
+def _normalize(vector):
+    return (vector / (np.linalg.norm(vector) + 1e-9)).astype(np.float32)
+
+class SpeakerIndex:
+    """
+    All enrolled embeddings stacked into one (n_users, dim) matrix, so
+    "who is speaking" is a single matrix-vector product instead of one
+    model call per user. Built lazily from the .npy files in VOICE_DB_DIR;
+    `convert_legacy(user_id)` embeds users who only have an old .wav.
+    """
+
+    def __init__(self, directory=VOICE_DB_DIR, convert_legacy=None):
+        self.directory = directory
+        self.convert_legacy = convert_legacy
+        self._user_ids = []
+        self._matrix = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        user_ids, vectors = [], []
+        names = set(os.listdir(self.directory))
+        for name in sorted(names):
+            user_id, ext = os.path.splitext(name)
+            try:
+                if ext == ".npy":
+                    vector = np.load(os.path.join(self.directory, name))
+                elif ext == ".wav" and f"{user_id}.npy" not in names and self.convert_legacy:
+                    vector = self.convert_legacy(user_id)   # enrolled before embeddings were stored
+                else:
+                    continue
+            except Exception as e:
+                print(f"⚠️ Skipping voice signature {name}: {e}")
+                continue
+            if vector is not None:
+                user_ids.append(user_id)
+                vectors.append(vector)
+        self._user_ids = user_ids
+        self._matrix = np.vstack(vectors).astype(np.float32) if vectors else None
+        self._loaded = True
+
+    def upsert(self, user_id, vector):
+        # Copy-on-write: search() scores a snapshot outside the lock, so the
+        # arrays it may be holding are never modified, only replaced.
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            row = vector[None, :].astype(np.float32)
+            if user_id in self._user_ids:
+                matrix = self._matrix.copy()
+                matrix[self._user_ids.index(user_id)] = row
+                self._matrix = matrix
+            elif self._matrix is None:
+                self._user_ids, self._matrix = [user_id], row
+            else:
+                self._user_ids = self._user_ids + [user_id]
+                self._matrix = np.vstack((self._matrix, row))
+
+    def search(self, vector, top_k=IDENTIFY_TOP_K):
+        """Returns [(user_id, score)] for the best matching users, best first."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            user_ids, matrix = self._user_ids, self._matrix
+        if matrix is None:
+            return []
+
+        scores = matrix @ vector
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(user_ids[i], float(scores[i])) for i in best]
+
 class VoiceAuthenticator:
     def __init__(self):
-        print("🔒 Loading Voice Security Model (SpeechBrain)...")
-        # Detect GPU or CPU
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        run_opts = {"device": self.device}
-        
-        self.verification_model = SpeakerRecognition.from_hparams(
-            source=MODEL_SOURCE, 
-            savedir=SAVED_MODEL_DIR, 
-            run_opts=run_opts
+        # LRU of user_id -> normalized reference embedding
+        self._embeddings = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.index = SpeakerIndex(convert_legacy=self._convert_legacy)
+        self.batcher = MicroBatcher(
+            self._encode_batch, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, name="voice.embed"
         )
-        print("✅ Voice Security Model Loaded.")
 
-    def enroll_user(self, user_id: str, audio_path: str):
+    @property
+    def verification_model(self):
+        """SpeechBrain ECAPA model, loaded on first use."""
+        return registry.get("speaker")
+
+    @property
+    def device(self):
+        return self.verification_model.device
+
+    def _manual_load(self, sources):
         """
-        Saves the uploaded audio as the 'Master Reference'.
+        Turns paths or decoded arrays into one zero-padded batch tensor plus
+        relative lengths (SoundFile/in-memory decoding, bypassing Torchaudio completely).
         """
-        user_signature_path = os.path.join(VOICE_DB_DIR, f"{user_id}.wav")
-        shutil.copy(audio_path, user_signature_path)
-        return True
+        import torch
+
+        # 1. Decode to 16 kHz mono float32 (no-op for arrays from services.audio)
+        clips = [
+            np.ascontiguousarray(s if isinstance(s, np.ndarray) else decode_audio(s), dtype=np.float32)
+            for s in sources
+        ]
+
+        # 2. Pad into one [batch, samples] array
+        longest = max(len(c) for c in clips)
+        batch = np.zeros((len(clips), longest), dtype=np.float32)
+        for row, clip in zip(batch, clips):
+            row[:len(clip)] = clip
+        lengths = np.array([len(c) / longest for c in clips], dtype=np.float32)
 
-    def _manual_load(self, path):
+        # 3. Move to Device
+        return torch.from_numpy(batch).to(self.device), torch.from_numpy(lengths).to(self.device)
+
+    def _encode_batch(self, sources):
         """
-        Loads audio using SoundFile (Bypassing Torchaudio completely).
+        Batcher callback. If the batch fails (e.g. one undecodable clip), the
+        clips are retried one by one so only the bad one's caller gets the
+        error; the rest were just unlucky enough to share its batch.
         """
-        # 1. Read file directly with SoundFile
-        data, samplerate = sf.read(path)
+        try:
+            return self._encode(sources)
+        except Exception:
+            if len(sources) == 1:
+                raise
+        metrics.incr("voice.embed.fallbacks")
+        results = []
+        for source in sources:
+            try:
+                results.append(self._encode([source])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _encode(self, sources):
+        """One ECAPA forward pass for the whole batch -> list of unit vectors."""
+        import torch
+
+        wavs, wav_lens = self._manual_load(sources)
+        with torch.no_grad():
+            embeddings = self.verification_model.encode_batch(wavs, wav_lens)
+        vectors = embeddings.reshape(len(sources), -1).cpu().numpy()
+        return [_normalize(v) for v in vectors]
+
+    def embed(self, audio):
+        """Unit-length float32 embedding, computed in a shared micro-batch."""
+        return self.batcher.submit(audio).result(EMBED_TIMEOUT)
 
-        # 2. Convert to PyTorch Tensor
-        tensor = torch.from_numpy(data).float()
+    def embed_many(self, audios):
+        return self.batcher.map(audios, timeout=EMBED_TIMEOUT)
 
-        # 3. Handle Channels
-        if len(tensor.shape) > 1:
-            tensor = tensor[:, 0]
-        
-        # 4. Add Batch Dimension
-        tensor = tensor.unsqueeze(0)
+    # --- REFERENCE EMBEDDING STORE ---
+    def _embedding_path(self, user_id):
+        return os.path.join(VOICE_DB_DIR, f"{user_id}.npy")
 
-        # 5. Move to Device
-        return tensor.to(self.device)
+    def _remember(self, user_id, vector):
+        with self._cache_lock:
+            self._embeddings[user_id] = vector
+            self._embeddings.move_to_end(user_id)
+            while len(self._embeddings) > EMBEDDING_CACHE_SIZE:
+                self._embeddings.popitem(last=False)
 
-    def verify_user(self, user_id: str, input_audio_path: str):
+    def get_reference(self, user_id: str):
+        """The user's enrolled embedding: memory LRU, then .npy on disk."""
+        with self._cache_lock:
+            vector = self._embeddings.get(user_id)
+            if vector is not None:
+                self._embeddings.move_to_end(user_id)
+                return vector
+
+        path = self._embedding_path(user_id)
+        if os.path.exists(path):
+            vector = np.load(path)
+        else:
+            vector = self._convert_legacy(user_id)
+            if vector is None:
+                return None
+            self.index.upsert(user_id, vector)
+
+        self._remember(user_id, vector)
+        return vector
+
+    def _convert_legacy(self, user_id):
+        """Users enrolled before embeddings were stored: embeds their WAV once and saves the .npy."""
+        legacy_wav = os.path.join(VOICE_DB_DIR, f"{user_id}.wav")
+        if not os.path.exists(legacy_wav):
+            return None
+        vector = self.embed(legacy_wav)
+        np.save(self._embedding_path(user_id), vector)
+        return vector
+
+    def enroll_user(self, user_id: str, samples):
         """
-        Compares input audio vs. Master Reference manually.
+        Computes the 'Master Reference' embedding and stores it.
+        `samples` is one decoded 16 kHz clip or a list of them; with several
+        clips the reference is their (re-normalized) centroid, which is more
+        robust to a single noisy recording.
         """
-        reference_path = os.path.join(VOICE_DB_DIR, f"{user_id}.wav")
-        
-        if not os.path.exists(reference_path):
-            print("❌ User not found.")
-            return False, 0.0 
+        if isinstance(samples, (np.ndarray, str)):
+            samples = [samples]
+        if not samples:
+            raise ValueError("At least one voice sample is required.")
 
+        vector = _normalize(np.mean(self.embed_many(samples), axis=0))
+        np.save(self._embedding_path(user_id), vector)
+        self._remember(user_id, vector)
+        self.index.upsert(user_id, vector)
+        return True
+
+    def verify_user(self, user_id: str, input_audio):
+        """
+        Compares input audio (decoded array or path) vs. the cached reference
+        embedding. Only the incoming clip goes through the encoder.
+        """
         try:
-            # A. Load files manually
-            ref_wav = self._manual_load(reference_path)
-            in_wav = self._manual_load(input_audio_path)
+            reference = self.get_reference(user_id)
+            if reference is None:
+                print("❌ User not found.")
+                return False, 0.0
 
-            # B. Verify Raw Tensors
-            score, prediction = self.verification_model.verify_batch(ref_wav, in_wav)
-            
-            # C. Output
-            return bool(prediction[0]), float(score[0])
+            # Cosine similarity of unit vectors is a dot product
+            score = float(np.dot(reference, self.embed(input_audio)))
+            return score > MATCH_THRESHOLD, score
 
         except Exception as e:
             print(f"❌ Verification Error: {e}")
@@ -91,4 +285,36 @@ class VoiceAuthenticator:
             traceback.print_exc()
             return False, 0.0
 
-voice_security = VoiceAuthenticator()
\ No newline at end of file
+    def verify_many(self, pairs):
+        """
+        Verifies [(user_id, audio)] together: all clips are embedded in
+        shared batches. Returns [(is_match, score)] in the same order.
+        """
+        futures = [self.batcher.submit(audio) for _, audio in pairs]
+        results = []
+        for (user_id, _), future in zip(pairs, futures):
+            try:
+                reference = self.get_reference(user_id)
+                if reference is None:
+                    results.append((False, 0.0))
+                    continue
+                score = float(np.dot(reference, future.result(EMBED_TIMEOUT)))
+                results.append((score > MATCH_THRESHOLD, score))
+            except Exception as e:
+                print(f"❌ Verification Error ({user_id}): {e}")
+                results.append((False, 0.0))
+        return results
+
+    def identify(self, audio, top_k=IDENTIFY_TOP_K):
+        """
+        1:N identification: embeds the clip once and scores it against every
+        enrolled user. Returns (user_id or None, score, candidates).
+        """
+        candidates = self.index.search(self.embed(audio), top_k)
+        if not candidates or candidates[0][1] <= MATCH_THRESHOLD:
+            best = candidates[0][1] if candidates else 0.0
+            return None, best, candidates
+        user_id, score = candidates[0]
+        return user_id, score, candidates
+
+voice_security = VoiceAuthenticator()
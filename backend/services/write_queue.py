@@ -0,0 +1,71 @@
+# services/write_queue.py
+import os
+from services.batcher import MicroBatcher
+from services.db import db_writer
+
+# --- CONFIG ---
+# Writes are grouped into one transaction (one fsync) per flush window.
+WRITE_FLUSH_MS = float(os.getenv("MINDMATE_WRITE_FLUSH_MS", "25"))
+WRITE_BATCH_MAX = int(os.getenv("MINDMATE_WRITE_BATCH", "256"))
+DURABLE_TIMEOUT = 10.0   # seconds a durable write waits for its commit
+
+def _run_ops(ops):
+    """
+    Runs every queued op in a single transaction on the writer connection.
+    Each op gets its own SAVEPOINT, so one bad row is rolled back (and
+    raised to its caller) without losing the rest of the batch.
+    """
+    results = []
+    with db_writer() as conn:
+        # Explicit BEGIN: otherwise the first SAVEPOINT would start (and its
+        # RELEASE would commit) the transaction
+        conn.execute("BEGIN")
+        for op, args in ops:
+            conn.execute("SAVEPOINT op")
+            try:
+                results.append(op(conn, *args))
+                conn.execute("RELEASE op")
+            except Exception as e:
+                conn.execute("ROLLBACK TO op")
+                conn.execute("RELEASE op")
+                results.append(e)
+    return results
+
+class WriteQueue:
+    """
+    Write-behind queue for the hot insert paths (chat log, events, notes,
+    voice analysis).
+
+    `op(conn, *args)` is a function that does its inserts on the given
+    connection. Ops queued within WRITE_FLUSH_MS (or up to WRITE_BATCH_MAX
+    of them) commit together. `durable=True` blocks until the commit and
+    returns the op's result; otherwise the write is fire-and-forget and can
+    be lost if the process dies inside the flush window.
+    """
+
+    def __init__(self, flush_ms=WRITE_FLUSH_MS, max_batch=WRITE_BATCH_MAX):
+        self._batcher = MicroBatcher(_run_ops, max_batch, flush_ms, name="db.write")
+
+    def write(self, op, *args, durable=False, timeout=DURABLE_TIMEOUT):
+        future = self._batcher.submit((op, args))
+        if durable:
+            return future.result(timeout)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def flush(self, timeout=DURABLE_TIMEOUT):
+        """Blocks until everything queued before this call is committed."""
+        self.write(lambda conn: None, durable=True, timeout=timeout)
+
+    def shutdown(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ Write queue flush failed on shutdown: {e}")
+        self._batcher.shutdown()
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"❌ Queued write failed: {future.exception()}")
+
+write_queue = WriteQueue()
@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import asyncio
 
 # 1. Path Setup
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -32,7 +33,7 @@ def manual_terminal_session():
         # --- PHASE 2: EXTRACTION (The Missing Link) ---
         # This uses the LLM to find the "Hidden" data
         print("🔍 Extracting Intent...")
-        extracted_data = nlp.analyze_conversation_payload(user_id, text)
+        extracted_data = asyncio.run(nlp.analyze_conversation_payload(user_id, text))
         
         if extracted_data.get("has_data"):
             category = extracted_data.get("category")
@@ -50,7 +51,7 @@ def manual_terminal_session():
 
         # --- PHASE 4: RESPONSE ---
         print("🧠 Thinking...")
-        response = nlp.generate_conversational_response(user_id, text)
+        response = asyncio.run(nlp.generate_conversational_response(user_id, text))
         print(f"💬 MindMate: {response}")
 
 if __name__ == "__main__":
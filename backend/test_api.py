@@ -1,11 +1,66 @@
 # backend/test_api.py
 import requests
+import time
 import uuid
 
 BASE_URL = "http://localhost:8000"
 TEST_USER = "test_admin"
 TEST_PASS = "admin123"
 
+def report(name, ok):
+    print(f"   {'✅' if ok else '❌'} {name}")
+
+def test_chat_history():
+    # Fresh user so the message count is known; each /chat/send logs 2 messages
+    user = f"pager_{uuid.uuid4().hex[:8]}"
+    for i in range(3):
+        requests.post(f"{BASE_URL}/chat/send", json={"user_id": user, "text": f"hello {i}"})
+    time.sleep(0.5)  # chat is logged write-behind
+
+    url = f"{BASE_URL}/chat/history"
+    first = requests.get(url, params={"user_id": user, "limit": 4})
+    page = first.json()
+    ids = [m["id"] for m in page["messages"]]
+    report("Newest page, oldest first", len(ids) == 4 and ids == sorted(ids) and page["has_more"])
+
+    older = requests.get(url, params={"user_id": user, "limit": 4, "before_id": page["next_before_id"]}).json()
+    older_ids = [m["id"] for m in older["messages"]]
+    report("before_id returns the rest", len(older_ids) == 2 and max(older_ids) < min(ids) and not older["has_more"])
+    report("Last page has no next_before_id", older["next_before_id"] is None)
+
+    etag = first.headers.get("ETag")
+    again = requests.get(url, params={"user_id": user, "limit": 4}, headers={"If-None-Match": etag})
+    report("Unchanged history answers 304", again.status_code == 304)
+
+    requests.post(f"{BASE_URL}/chat/send", json={"user_id": user, "text": "one more"})
+    time.sleep(0.5)
+    changed = requests.get(url, params={"user_id": user, "limit": 4}, headers={"If-None-Match": etag})
+    report("New messages change the ETag", changed.status_code == 200 and changed.headers.get("ETag") != etag)
+    since = requests.get(url, params={"user_id": user, "since_id": page["latest_id"]}).json()
+    report("since_id returns only the new messages", [m["text"] for m in since["messages"]][:1] == ["one more"])
+
+def test_timeline_sync():
+    user = f"pager_{uuid.uuid4().hex[:8]}"
+    for i in range(3):
+        requests.post(f"{BASE_URL}/memories", json={"user_id": user, "title": f"Memory {i}", "content": "-", "category": "Test"})
+    time.sleep(1.1)  # updated_at has one-second resolution
+
+    url = f"{BASE_URL}/memories"
+    page = requests.get(url, params={"user_id": user, "limit": 2}).json()
+    report("Timeline pages newest first",
+           [m["title"] for m in page["timeline"]] == ["Memory 2", "Memory 1"] and page["has_more"])
+    rest = requests.get(url, params={"user_id": user, "limit": 2, "before_id": page["next_before_id"]}).json()
+    report("before_id returns the older page", [m["title"] for m in rest["timeline"]] == ["Memory 0"])
+
+    bad = requests.get(url, params={"user_id": user, "since": "garbage"})
+    report("Unparseable since= is rejected", bad.status_code == 400)
+    unchanged = requests.get(url, params={"user_id": user, "since": page["synced_at"]}).json()
+    report("since= skips rows that did not change", unchanged["timeline"] == [])
+    requests.post(url, json={"user_id": user, "title": "Memory 3", "content": "-", "category": "Test"})
+    changed = requests.get(url, params={"user_id": user, "since": page["synced_at"], "fields": "title"}).json()
+    rows = [{k: v for k, v in row.items() if k != "id"} for row in changed["timeline"]]
+    report("since= returns only new rows, with just the requested fields", rows == [{"title": "Memory 3"}])
+
 def run_tests():
     print("🚀 STARTING API SYSTEM CHECK...\n")
     
@@ -51,6 +106,14 @@ def run_tests():
     else:
         print(f"   ❌ Chat Module: FAILED ({chat_resp.status_code})")
 
+    # 4. TEST CHAT HISTORY (keyset pages + ETag)
+    print("\n🔹 Testing Chat History...")
+    test_chat_history()
+
+    # 5. TEST TIMELINE SYNC (pages + ?since=)
+    print("\n🔹 Testing Timeline Sync...")
+    test_timeline_sync()
+
     print("\n🎉 SYSTEM CHECK COMPLETE.")
 
 if __name__ == "__main__":
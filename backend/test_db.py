@@ -0,0 +1,252 @@
+# backend/test_db.py
+import os
+import sys
+import sqlite3
+import tempfile
+import numpy as np
+
+# Add backend root to path so 'services' is visible
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Point every pooled connection at a throwaway database before anything opens one
+TMP_DIR = tempfile.mkdtemp(prefix="mindmate-test-")
+from services import db, init_db
+db.DB_PATH = init_db.DB_PATH = os.path.join(TMP_DIR, "mindmate.db")
+
+from services.db import db_reader, db_writer
+from services.migrations import migrate, MIGRATIONS, LEGACY_CHAT_TIMESTAMP
+
+failures = []
+
+def check(name, ok, detail=""):
+    print(f"   {'✅' if ok else '❌'} {name}" + (f"  ->  {detail}" if not ok and detail else ""))
+    if not ok:
+        failures.append(name)
+
+def fresh_connection(name):
+    return sqlite3.connect(os.path.join(TMP_DIR, name))
+
+def schema(conn):
+    """{table: columns} plus index names, ignoring FTS shadow tables."""
+    tables = {
+        row[0]: sorted(c[1] for c in conn.execute(f"PRAGMA table_info({row[0]})"))
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'knowledge_fts%'")
+    }
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")}
+    return tables, indexes
+
+# --- MIGRATIONS ---
+def test_migrations():
+    print("🔹 Testing migrations...")
+    latest = MIGRATIONS[-1][0]
+
+    fresh = fresh_connection("fresh.db")
+    check("fresh database reaches the latest version", migrate(fresh) == latest)
+    check("re-running is a no-op", migrate(fresh) == latest)
+    tables, _ = schema(fresh)
+    check("legacy messages table is gone", "messages" not in tables)
+
+    # Shaped like a database from before the migrations existed
+    legacy = fresh_connection("legacy.db")
+    legacy.executescript("""
+        CREATE TABLE users (user_id TEXT PRIMARY KEY, password TEXT);
+        CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, title TEXT, start_time TEXT);
+        CREATE TABLE messages (id INTEGER PRIMARY KEY, user_id TEXT, sender TEXT, text TEXT);
+        CREATE TABLE chat_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, sender TEXT,
+                                    text TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP);
+        INSERT INTO users VALUES ('alice', 'secret');
+        INSERT INTO events (user_id, title, start_time) VALUES ('alice', 'Dentist', '2026-10-19T09:30');
+        INSERT INTO messages (user_id, sender, text) VALUES ('alice', 'user', 'old text chat');
+        INSERT INTO chat_messages (user_id, sender, text, timestamp) VALUES ('alice', 'user', 'newer voice chat', '2026-10-18 10:00:00');
+    """)
+    check("legacy database reaches the latest version", migrate(legacy) == latest)
+
+    row = legacy.execute("SELECT password_hash FROM users WHERE user_id = 'alice'").fetchone()
+    check("legacy password copied to password_hash", row == ("secret",), row)
+    row = legacy.execute("SELECT start_time FROM events").fetchone()
+    check("free-form event time normalized", row == ("2026-10-19 09:30:00",), row)
+    rows = legacy.execute("SELECT id, text, timestamp FROM chat_messages ORDER BY id").fetchall()
+    check("merged legacy chat comes first, with the placeholder time",
+          [r[1] for r in rows] == ["old text chat", "newer voice chat"] and rows[0][2] == LEGACY_CHAT_TIMESTAMP, rows)
+    check("existing chat ids are unchanged", rows[-1][0] == 1, rows)
+
+    # Same steps, same schema: only the legacy users.password column differs
+    fresh_tables, fresh_indexes = schema(fresh)
+    legacy_tables, legacy_indexes = schema(legacy)
+    legacy_tables["users"].remove("password")
+    check("legacy database ends with the fresh schema", legacy_tables == fresh_tables,
+          {t: c for t, c in legacy_tables.items() if fresh_tables.get(t) != c})
+    check("legacy database has the same indexes", legacy_indexes == fresh_indexes,
+          legacy_indexes ^ fresh_indexes)
+
+# --- FULL-TEXT SEARCH ---
+def fts_titles(user_id, term):
+    with db_reader() as conn:
+        rows = conn.execute(
+            "SELECT title FROM knowledge_fts WHERE knowledge_fts MATCH ? AND user_id = ?", (f'"{term}"', user_id)
+        ).fetchall()
+    return sorted(row[0] for row in rows)
+
+def test_search_index():
+    print("\n🔹 Testing full-text search triggers...")
+    with db_writer() as conn:
+        note_id = conn.execute(
+            "INSERT INTO notes (user_id, title, summary, original_text) VALUES ('fts', 'Risotto', 'stir constantly', 'arborio rice')"
+        ).lastrowid
+        conn.execute("INSERT INTO events (user_id, title, start_time, location_name) VALUES ('fts', 'Dentist', '2026-10-19 09:30:00', 'Clinic')")
+        conn.execute("INSERT INTO notes (user_id, title, summary) VALUES ('someone-else', 'Risotto', 'not yours')")
+    check("insert is searchable", fts_titles("fts", "arborio") == ["Risotto"])
+    check("events are indexed too", fts_titles("fts", "clinic") == ["Dentist"])
+    check("search is per user", fts_titles("fts", "risotto") == ["Risotto"])
+    check("porter stemming matches word forms", fts_titles("fts", "stirring") == ["Risotto"])
+    check("event dates are indexed", fts_titles("fts", "19") == ["Dentist"])
+
+    with db_writer() as conn:
+        conn.execute("UPDATE notes SET title = 'Paella', summary = 'saffron' WHERE id = ?", (note_id,))
+    check("update replaces the old text", fts_titles("fts", "stir") == [] and fts_titles("fts", "saffron") == ["Paella"])
+
+    with db_writer() as conn:
+        conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+    check("delete removes the entry", fts_titles("fts", "saffron") == [])
+
+# --- WRITE-BEHIND QUEUE ---
+def insert_chat(conn, text, fail=False):
+    conn.execute("INSERT INTO chat_messages (user_id, sender, text) VALUES ('queue', 'user', ?)", (text,))
+    if fail:
+        raise ValueError("rejected after its insert")
+
+def test_write_queue():
+    print("\n🔹 Testing write-behind queue...")
+    from services.metrics import metrics
+    from services.write_queue import write_queue
+
+    batches = metrics.snapshot()["counters"].get("db.write.batches", 0)
+    # Queued back to back, so they share one flush window (one transaction).
+    # The queue logs the rejected op as "Queued write failed": that is expected.
+    futures = [
+        write_queue.write(insert_chat, "first"),
+        write_queue.write(insert_chat, "bad", True),
+        write_queue.write(insert_chat, "last"),
+    ]
+    for future in futures:
+        future.exception(timeout=5)
+    check("ops were grouped into one batch", metrics.snapshot()["counters"]["db.write.batches"] == batches + 1)
+    check("the failing op raises to its caller only",
+          isinstance(futures[1].exception(), ValueError) and futures[0].exception() is None and futures[2].exception() is None)
+
+    with db_reader() as conn:
+        texts = [row[0] for row in conn.execute("SELECT text FROM chat_messages WHERE user_id = 'queue' ORDER BY id")]
+    check("its savepoint rolled back only its own insert", texts == ["first", "last"], texts)
+    check("durable writes return the op's result", write_queue.write(lambda conn: 42, durable=True) == 42)
+
+# --- CONTEXT CACHE ---
+def test_context_cache():
+    print("\n🔹 Testing context cache invalidation...")
+    from services.context_cache import context_cache
+    from services.db_helper import save_extracted_data
+    from services.vectors import vector_index
+
+    vector_index._down_until = float("inf")    # no Ollama here: skip embedding
+    builds = []
+    def build():
+        builds.append(1)
+        return len(builds)
+
+    context_cache.get("ctx", build, key="h1")
+    check("second turn is served from the cache", context_cache.get("ctx", build, key="h1") == 1)
+    check("a new key (next hour) rebuilds", context_cache.get("ctx", build, key="h2") == 2)
+
+    save_extracted_data("ctx", {"category": "note", "note": {"heading": "Gym", "summary": "legs day"}, "raw_text": "gym"})
+    check("saving a note invalidates the user's context", context_cache.get("ctx", build, key="h2") == 3)
+
+    # A write that lands while the context is being built must not be cached over
+    def build_during_write():
+        context_cache.invalidate("ctx")
+        return "stale"
+    context_cache.invalidate("ctx")
+    context_cache.get("ctx", build_during_write, key="h2")
+    check("a value built across a write is not cached", context_cache.get("ctx", build, key="h2") == 4)
+
+# --- VECTOR INDEX ---
+def test_vector_sync():
+    print("\n🔹 Testing vector index sync...")
+    from services.vectors import VectorIndex, UserVectors
+
+    index = VectorIndex(root=os.path.join(TMP_DIR, "vectors"))
+    embedded = []
+    def fake_embed(texts):    # no Ollama here
+        embedded.extend(texts)
+        return np.full((len(texts), 4), 0.5, dtype=np.float32)
+    index.embed = fake_embed
+
+    with db_writer() as conn:
+        note_id = conn.execute("INSERT INTO notes (user_id, title, summary) VALUES ('vec', 'Groceries', 'milk')").lastrowid
+    index.sync_user("vec")
+    check("new rows are embedded", embedded == ["Groceries milk"], embedded)
+    index.sync_user("vec")
+    check("unchanged rows are not embedded again", len(embedded) == 1, embedded)
+
+    # Usually within the same second as the insert, so updated_at alone can't tell
+    with db_writer() as conn:
+        conn.execute("UPDATE notes SET summary = 'oat milk' WHERE id = ?", (note_id,))
+    index.sync_user("vec")
+    check("edited rows are embedded again", embedded[1:] == ["Groceries oat milk"], embedded)
+    ids, _ = UserVectors(index._user_dir("vec")).load()
+    check("only the latest vector of a record is searched", ids.tolist() == [note_id * 4 + 1], ids)
+
+# --- HYBRID RETRIEVAL ---
+def test_hybrid_retrieval():
+    print("\n🔹 Testing keyword + semantic fusion...")
+    from app import nlp
+    from services.vectors import vector_index
+
+    with db_writer() as conn:
+        ids = {
+            title: conn.execute("INSERT INTO notes (user_id, title, summary) VALUES ('rrf', ?, ?)", (title, summary)).lastrowid
+            for title, summary in [("Doctor visit", "bring the referral"), ("Doctor bill", "pay by Friday"),
+                                   ("Physician follow-up", "blood results")]
+        }
+    rowid = {title: note_id * 4 + 1 for title, note_id in ids.items()}   # knowledge_fts rowid of a note
+
+    # Stand-in for the embedding ranking: the paraphrase first, then one keyword hit
+    search = vector_index.search
+    vector_index.search = lambda user_id, query, k: [rowid["Physician follow-up"], rowid["Doctor bill"]]
+    try:
+        lines = nlp.get_relevant_knowledge("rrf", "doctor").splitlines()
+    finally:
+        vector_index.search = search
+    titles = [line.split(": ", 1)[1].split(" - ")[0] for line in lines]
+    check("a record ranked by both searches comes first", titles[:1] == ["Doctor bill"], titles)
+    check("semantic-only and keyword-only hits are both kept",
+          sorted(titles) == ["Doctor bill", "Doctor visit", "Physician follow-up"], titles)
+
+    vector_index._down_until = float("inf")
+    titles = nlp.get_relevant_knowledge("rrf", "doctor")
+    check("keyword results still work without embeddings", "Doctor visit" in titles and "Physician" not in titles, titles)
+
+    with db_writer() as conn:
+        conn.execute("INSERT INTO events (user_id, title, start_time) VALUES ('rrf', 'Dentist', '2026-10-19 09:30:00')")
+        conn.execute("INSERT INTO events (user_id, title, start_time) VALUES ('RRF', 'Not mine', '2026-10-19 10:00:00')")
+    found = nlp.get_relevant_knowledge("rrf", "what is on 2026-10-19?")
+    check("a date keyword finds the user's event, and only theirs",
+          found == "Event: Dentist at 2026-10-19 09:30:00", found)
+
+def run_tests():
+    print("🚀 STARTING DATABASE CHECKS...\n")
+    test_migrations()
+
+    with db_writer() as conn:
+        migrate(conn)
+    test_search_index()
+    test_write_queue()
+    test_context_cache()
+    test_vector_sync()
+    test_hybrid_retrieval()
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\n✅ All database checks passed")
+
+if __name__ == "__main__":
+    run_tests()
@@ -1,5 +1,6 @@
 import sys
 import os
+import asyncio
 
 # Ensure the backend root is in the path to find app.nlp
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -45,7 +46,7 @@ def run_persona_tests():
         print(f"❓ Q: {case['query']}")
         
         # This calls the RAG logic inside nlp.py
-        response = nlp.generate_conversational_response(case['user'], case['query'])
+        response = asyncio.run(nlp.generate_conversational_response(case['user'], case['query']))
         
         print(f"💬 MindMate: {response}\n")
 
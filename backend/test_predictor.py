@@ -0,0 +1,60 @@
+# backend/test_predictor.py
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+# Add backend root to path so 'models' is visible
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models import predictor
+from models.lookup import HabitLookupTable
+
+def train_throwaway_model(path):
+    # Any model over [hour_sin, hour_cos, day, prev, loc, fat] works: we only
+    # check that the compiled table and the live model agree.
+    rng = np.random.default_rng(7)
+    hour = rng.integers(0, 48, 2000) / 2
+    X = np.column_stack([np.sin(2 * np.pi * hour / 24), np.cos(2 * np.pi * hour / 24),
+                         rng.integers(0, 7, 2000), rng.integers(0, 6, 2000),
+                         rng.integers(0, 4, 2000), rng.integers(0, 3, 2000)])
+    y = (hour * 2).astype(int) % 6
+    joblib.dump(RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y), path)
+
+def run_tests():
+    print("🚀 CHECKING HABIT LOOKUP GRID...\n")
+    tmp = tempfile.mkdtemp()
+    model_path = os.path.join(tmp, "habit_model.pkl")
+    train_throwaway_model(model_path)
+    predictor.lookup = HabitLookupTable(model_path, predictor.lookup.shape, predictor._grid_features)
+
+    engine = predictor.MindMateModel()
+    model = predictor.lookup.model
+    failures = 0
+    start = datetime(2026, 10, 19)  # a Monday
+    for step in range(7 * 48):
+        when = start + timedelta(minutes=step * predictor.SLOT_MINUTES)
+        for prev, loc, fat in [("Work", "Office", "Medium"), ("Rest", "Home", "High")]:
+            got = engine.predict_next_slot(prev, loc, fat, when)
+
+            hour = when.hour + when.minute / 60
+            X = [[np.sin(2 * np.pi * hour / 24), np.cos(2 * np.pi * hour / 24), when.weekday(),
+                  predictor.activity_map[prev], predictor.location_map[loc], predictor.fatigue_map[fat]]]
+            probs = model.predict_proba(X)[0]
+            expected = sorted(((i, p) for i, p in enumerate(probs) if p > 0.05), key=lambda x: x[1], reverse=True)
+
+            if [round(p["probability"], 5) for p in got] != [round(float(p), 5) for _, p in expected]:
+                failures += 1
+                if failures <= 5:
+                    print(f"   ❌ {when:%a %H:%M} {prev}/{loc}/{fat}: table {got} != model {expected}")
+
+    if failures:
+        print(f"\n❌ Lookup grid disagrees with the model in {failures} cases")
+        sys.exit(1)
+    print("   ✅ Table matches the model at every :00 and :30 slot of the week")
+
+if __name__ == "__main__":
+    run_tests()
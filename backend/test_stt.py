@@ -1,5 +1,6 @@
 import os
 import sys
+import asyncio
 
 # Add backend root to path so 'app' is visible
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -20,7 +21,7 @@ def run_test(audio_path="voice.wav"):
 
     # 3. Cognition (Ollama)
     print("🧠 Thinking...")
-    response = nlp.generate_conversational_response("admin", text)
+    response = asyncio.run(nlp.generate_conversational_response("admin", text))
     print(f"💬 MindMate: {response}")
 
 if __name__ == "__main__":